@@ -1,18 +1,16 @@
-import os
-import sys
-from typing import List, Optional
-
-# Add XAgent to Python path
-xagent_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..', '..', 'XAgent')
-if xagent_path not in sys.path:
-    sys.path.insert(0, xagent_path)
+from typing import Any, List, Optional
 
 from langchain.schema import AIMessage, SystemMessage
 from langchain_community.chat_models import ChatOpenAI
 
 from agents.agent_simulations.agent.dialogue_agent import DialogueAgent
 from agents.conversational.output_parser import ConvoOutputParser
-from agents.xagent_integration import L3AGIXAgentAdapter
+from agents.xagent_batching import micro_batched
+from agents.xagent_compaction import HistoryCompactor
+from agents.xagent_integration import adapter_pool
+from agents.xagent_memory import zep_memory_cache
+from agents.xagent_metrics import log_usage_to_run_logs
+from agents.xagent_scheduler import PRIORITY_SIMULATION
 from config import Config
 from memory.zep.zep_memory import ZepMemory
 from services.run_log import RunLogsManager
@@ -31,6 +29,7 @@ class DialogueAgentWithTools(DialogueAgent):
         sender_name: str,
         is_memory: bool = False,
         run_logs_manager: Optional[RunLogsManager] = None,
+        llm_backend: Optional[Any] = None,
         **tool_kwargs,
     ) -> None:
         super().__init__(name, agent_with_configs, system_message, model)
@@ -39,43 +38,60 @@ class DialogueAgentWithTools(DialogueAgent):
         self.sender_name = sender_name
         self.is_memory = is_memory
         self.run_logs_manager = run_logs_manager
+        # Simulation turns of every agent share one micro-batcher per backend
+        self.llm_backend = micro_batched(llm_backend)
+        self.history_compactor = HistoryCompactor(
+            model=getattr(agent_with_configs.configs, "model_name", None) or "gpt-3.5-turbo"
+        )
 
     def send(self) -> str:
         """
         Applies XAgent to the message history and returns the message string
         """
 
-        memory: ZepMemory
+        memory: Optional[ZepMemory] = None
 
-        # FIXME: This is a hack to get the memory working
-        # if self.is_memory:
-        memory = ZepMemory(
-            session_id=self.session_id,
-            url=Config.ZEP_API_URL,
-            api_key=Config.ZEP_API_KEY,
-            memory_key="chat_history",
-            return_messages=True,
-        )
+        # The adapter loads Zep history into the prompt, which only memory
+        # agents want; the simulation transcript is already in the prompt
+        if self.is_memory:
+            memory = zep_memory_cache.get(
+                self.session_id,
+                ZepMemory,
+                url=Config.ZEP_API_URL,
+                api_key=Config.ZEP_API_KEY,
+                memory_key="chat_history",
+                return_messages=True,
+            )
 
-        memory.human_name = self.sender_name
-        memory.ai_name = self.agent_with_configs.agent.name
-        memory.auto_save = False
+        # Recent turns verbatim, older turns as a cached running summary
+        prompt = self.history_compactor.compact(self.message_history, self.prefix)
 
-        # Initialize XAgent adapter
-        xagent_adapter = L3AGIXAgentAdapter(
+        # Check out a warm XAgent adapter for this agent
+        with adapter_pool.lease(
+            self.agent_with_configs.agent.id,
             config=self.agent_with_configs.configs,
             tools=self.tools,
             system_message=self.system_message.content,
-            memory=memory
-        )
+            memory=memory,
+            session_id=self.session_id,
+            account_id=getattr(self.agent_with_configs.agent, "account_id", None),
+            priority=PRIORITY_SIMULATION,
+            llm_backend=self.llm_backend,
+            human_name=self.sender_name,
+            ai_name=self.agent_with_configs.agent.name,
+            # The simulation transcript is kept by the simulation itself
+            auto_save=False,
+        ) as xagent_adapter:
+            try:
+                # Use XAgent to process the prompt
+                res = xagent_adapter.run(prompt)
+            except Exception as e:
+                res = f"Error in XAgent execution: {str(e)}"
 
-        prompt = "\n".join(self.message_history + [self.prefix])
+            usage = xagent_adapter.last_usage
 
-        try:
-            # Use XAgent to process the prompt
-            res = xagent_adapter.run(prompt)
-        except Exception as e:
-            res = f"Error in XAgent execution: {str(e)}"
+        if self.run_logs_manager:
+            log_usage_to_run_logs(self.run_logs_manager, usage, res)
 
         # FIXME: is memory
         # memory.save_ai_message(res)
@@ -1,17 +1,17 @@
 import asyncio
-import os
-import sys
-
-# Add XAgent to Python path
-xagent_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..', 'XAgent')
-if xagent_path not in sys.path:
-    sys.path.insert(0, xagent_path)
+import time
 
 from agents.base_agent import BaseAgent
 from agents.conversational.output_parser import ConvoOutputParser
 from agents.conversational.streaming_aiter import AsyncCallbackHandler
 from agents.handle_agent_errors import handle_agent_error
-from agents.xagent_integration import L3AGIXAgentAdapter
+from agents.xagent_integration import adapter_pool
+from agents.xagent_memory import memory_writer, zep_memory_cache
+from agents.xagent_metrics import log_usage_to_run_logs
+from agents.xagent_persistence import message_dispatcher
+from agents.xagent_prompt import system_prompt_cache
+from agents.xagent_tracing import tracer
+from agents.xagent_voice import StreamingTextToSpeech
 from config import Config
 from memory.zep.zep_memory import ZepMemory
 from postgres import PostgresChatMessageHistory
@@ -39,82 +39,116 @@ class ConversationalAgent(BaseAgent):
         run_logs_manager: RunLogsManager,
         pre_retrieved_context: str,
     ):
-        memory = ZepMemory(
+        with tracer.span(
+            "conversational.run",
             session_id=str(self.session_id),
-            url=Config.ZEP_API_URL,
-            api_key=Config.ZEP_API_KEY,
-            memory_key="chat_history",
-            return_messages=True,
-        )
-
-        memory.human_name = self.sender_name
-        memory.ai_name = agent_with_configs.agent.name
+            agent_id=str(agent_with_configs.agent.id),
+            voice_input=bool(voice_url),
+        ):
+            with tracer.span("zep_memory.get"):
+                # Cached per session, sharing one pooled Zep client
+                memory = zep_memory_cache.get(
+                    self.session_id,
+                    ZepMemory,
+                    url=Config.ZEP_API_URL,
+                    api_key=Config.ZEP_API_KEY,
+                    memory_key="chat_history",
+                    return_messages=True,
+                )
+
+            with tracer.span("system_message.build"):
+                # Built once per agent config version (and retrieved context)
+                system_message = system_prompt_cache.get(
+                    agent_with_configs, pre_retrieved_context, SystemMessageBuilder
+                )
+
+            res: str
+            tts = None
 
-        system_message = SystemMessageBuilder(
-            agent_with_configs, pre_retrieved_context
-        ).build()
+            try:
+                configs = agent_with_configs.configs
+                if "Voice" in configs.response_mode:
+                    # Synthesizes off the event loop, sentence by sentence if enabled
+                    tts = StreamingTextToSpeech(
+                        lambda text: text_to_speech(text, configs, voice_settings)
+                    )
+
+                if voice_url:
+                    with tracer.span("voice.speech_to_text"):
+                        prompt = await asyncio.get_running_loop().run_in_executor(
+                            None, speech_to_text, voice_url, configs, voice_settings
+                        )
+
+                # Check out a warm XAgent adapter for this agent
+                with adapter_pool.lease(
+                    agent_with_configs.agent.id,
+                    config=agent_with_configs.configs,
+                    tools=tools,
+                    system_message=system_message,
+                    memory=memory,
+                    session_id=str(self.session_id),
+                    account_id=getattr(agent_with_configs.agent, "account_id", None),
+                    human_name=self.sender_name,
+                    ai_name=agent_with_configs.agent.name,
+                    auto_save=True,
+                ) as xagent_adapter:
+                    # Create streaming response using XAgent
+                    streaming_response = []
+                    
+                    with tracer.span("xagent.astream") as stream_span:
+                        started = time.perf_counter()
+                        try:
+                            async for chunk in xagent_adapter.astream(prompt):
+                                if chunk:
+                                    if not streaming_response:
+                                        stream_span.set_attribute(
+                                            "time_to_first_chunk_ms",
+                                            (time.perf_counter() - started) * 1000,
+                                        )
+                                    streaming_response.append(chunk)
+                                    if tts:
+                                        tts.feed(chunk)
+                                    yield chunk
+                                    
+                            res = "".join(streaming_response)
+                        except Exception as e:
+                            # Fallback to non-streaming response
+                            stream_span.set_attribute("fallback", str(e))
+                            res = await xagent_adapter.arun(prompt)
+                            yield res
+
+                        usage = xagent_adapter.last_usage
+                        stream_span.set_attribute("llm_calls", usage.calls)
+                        stream_span.set_attribute("total_tokens", usage.total_tokens)
+
+                log_usage_to_run_logs(run_logs_manager, usage, res)
+
+            except Exception as err:
+                res = handle_agent_error(err)
+
+                # Written behind the response, batched with other sessions' turns
+                memory_writer.save(memory, prompt, res, human_name=self.sender_name,
+                                   ai_name=agent_with_configs.agent.name)
 
-        res: str
+                yield res
 
-        try:
-            if voice_url:
-                configs = agent_with_configs.configs
-                prompt = speech_to_text(voice_url, configs, voice_settings)
-
-            # Initialize XAgent adapter
-            xagent_adapter = L3AGIXAgentAdapter(
-                config=agent_with_configs.configs,
-                tools=tools,
-                system_message=system_message,
-                memory=memory
-            )
-
-            # Create streaming response using XAgent
-            streaming_response = []
-            
             try:
-                async for chunk in xagent_adapter.astream(prompt):
-                    if chunk:
-                        streaming_response.append(chunk)
-                        yield chunk
-                        
-                res = "".join(streaming_response)
-            except Exception as e:
-                # Fallback to non-streaming response
-                res = await xagent_adapter.arun(prompt)
+                voice_url = None
+                if tts:
+                    with tracer.span("voice.text_to_speech"):
+                        voice_url = await tts.finish(res)
+            except Exception as err:
+                res = f"{res}\n\n{handle_agent_error(err)}"
+
                 yield res
 
-        except Exception as err:
-            res = handle_agent_error(err)
-
-            memory.save_context(
-                {
-                    "input": prompt,
-                    "chat_history": memory.load_memory_variables({})["chat_history"],
-                },
-                {
-                    "output": res,
-                },
-            )
-
-            yield res
-
-        try:
-            configs = agent_with_configs.configs
-            voice_url = None
-            if "Voice" in configs.response_mode:
-                voice_url = text_to_speech(res, configs, voice_settings)
-                pass
-        except Exception as err:
-            res = f"{res}\n\n{handle_agent_error(err)}"
-
-            yield res
-
-        ai_message = history.create_ai_message(
-            res,
-            human_message_id,
-            agent_with_configs.agent.id,
-            voice_url,
-        )
-
-        chat_pubsub_service.send_chat_message(chat_message=ai_message)
+            # Stored and published by background workers, in order per session
+            with tracer.span("ai_message.submit"):
+                await message_dispatcher.submit(
+                    history,
+                    chat_pubsub_service,
+                    res,
+                    human_message_id,
+                    agent_with_configs.agent.id,
+                    voice_url,
+                )
@@ -0,0 +1,186 @@
+"""
+Micro-batching of small, independent LLM completions
+
+Offline workloads (evaluations, agent simulations) issue many short
+completions one call at a time. MicroBatcher wraps a batch-capable
+llm_backend: acomplete() calls with the same completion settings and
+function schemas that arrive within a short window are sent as one
+acomplete_batch() call, and each caller receives its own result. Streaming
+calls pass straight through.
+
+A backend is batch-capable if it provides
+async acomplete_batch(requests, functions) -> [(response, usage), ...],
+returning results in request order; an exception in place of a result fails
+only that request. MockLLMBackend implements it as a local stand-in.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from agents.xagent_tracing import tracer
+
+# Seconds a batch waits for more requests (0 disables batching) and its size limit
+XAGENT_MICRO_BATCH_WINDOW = float(os.environ.get("XAGENT_MICRO_BATCH_WINDOW", "0.02"))
+XAGENT_MICRO_BATCH_MAX_SIZE = int(os.environ.get("XAGENT_MICRO_BATCH_MAX_SIZE", "16"))
+
+
+def supports_batching(backend: Any) -> bool:
+    """Whether an llm_backend provides acomplete_batch"""
+    return callable(getattr(backend, "acomplete_batch", None))
+
+
+class _Batch:
+    """Requests collected for one batch call"""
+
+    def __init__(self, functions: List[Dict], loop: asyncio.AbstractEventLoop):
+        self.functions = functions
+        self.loop = loop
+        self.requests: List[Dict] = []
+        self.futures: List[concurrent.futures.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """
+    llm_backend that groups compatible acomplete() calls into batch calls
+    """
+
+    def __init__(self, backend: Any, window: float = XAGENT_MICRO_BATCH_WINDOW,
+                 max_batch_size: int = XAGENT_MICRO_BATCH_MAX_SIZE):
+        """
+        Initialize the batcher
+
+        Args:
+            backend: Batch-capable llm_backend
+            window: Seconds the first request of a batch waits for others
+            max_batch_size: Requests per batch call; a full batch is sent
+                without waiting for the window to close
+        """
+        self.backend = backend
+        self.window = window
+        self.max_batch_size = max(1, max_batch_size)
+        self.batches_sent = 0
+        self.requests_batched = 0
+        self._pending: Dict[str, _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    async def acomplete(self, request: Dict, functions: List[Dict]) -> Tuple[Dict, Dict]:
+        """
+        Complete a request as part of the next compatible batch
+
+        Args:
+            request: Completion kwargs including "messages"
+            functions: Function schemas available to the model
+
+        Returns:
+            Tuple of (response dict, usage dict)
+        """
+        if self.window <= 0 or self.max_batch_size <= 1:
+            return await self.backend.acomplete(request, functions)
+
+        key = self._batch_key(request, functions)
+        future = concurrent.futures.Future()
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                # The batch is sent from the loop of its first request
+                batch = self._pending[key] = _Batch(functions, loop)
+                batch.timer = loop.call_later(self.window, self._close, key, batch)
+            batch.requests.append(request)
+            batch.futures.append(future)
+            full = len(batch.requests) >= self.max_batch_size
+            if full:
+                del self._pending[key]
+
+        if full:
+            batch.loop.call_soon_threadsafe(self._send, batch)
+        return await asyncio.wrap_future(future)
+
+    async def astream(self, request: Dict, functions: List[Dict]):
+        """Stream a response directly from the backend (never batched)"""
+        async for delta in self.backend.astream(request, functions):
+            yield delta
+
+    def _close(self, key: str, batch: _Batch):
+        """Send a batch whose window has elapsed, unless it was sent when full"""
+        with self._lock:
+            if self._pending.get(key) is not batch:
+                return
+            del self._pending[key]
+        self._send(batch)
+
+    def _send(self, batch: _Batch):
+        batch.timer.cancel()
+        task = batch.loop.create_task(self._complete_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _complete_batch(self, batch: _Batch):
+        # Requests whose callers gave up before the batch left are dropped
+        items = [
+            (request, future)
+            for request, future in zip(batch.requests, batch.futures)
+            if future.set_running_or_notify_cancel()
+        ]
+        if not items:
+            return
+
+        requests = [request for request, _ in items]
+        self.batches_sent += 1
+        self.requests_batched += len(requests)
+        try:
+            with tracer.span("xagent.llm_batch", batch_size=len(requests)):
+                results = await self.backend.acomplete_batch(requests, batch.functions)
+            if len(results) != len(requests):
+                raise ValueError(f"Batch backend returned {len(results)} results for {len(requests)} requests")
+        except BaseException as e:
+            for _, future in items:
+                future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+
+        for (_, future), result in zip(items, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _batch_key(request: Dict, functions: List[Dict]) -> str:
+        """Requests are compatible if everything but their messages matches"""
+        settings = {name: value for name, value in request.items() if name != "messages"}
+        return json.dumps([settings, functions], sort_keys=True, default=str)
+
+
+_batchers: "weakref.WeakKeyDictionary[Any, MicroBatcher]" = weakref.WeakKeyDictionary()
+_batchers_lock = threading.Lock()
+
+
+def micro_batched(backend: Any) -> Any:
+    """
+    Return the shared MicroBatcher of a batch-capable backend
+
+    Every caller of the same backend gets the same batcher, so requests from
+    different sessions land in the same batches. Backends without
+    acomplete_batch (and None) are returned unchanged, as is everything when
+    XAGENT_MICRO_BATCH_WINDOW is 0.
+    """
+    if backend is None or isinstance(backend, MicroBatcher) or not supports_batching(backend):
+        return backend
+    if XAGENT_MICRO_BATCH_WINDOW <= 0:
+        return backend
+
+    with _batchers_lock:
+        batcher = _batchers.get(backend)
+        if batcher is None:
+            batcher = _batchers[backend] = MicroBatcher(backend)
+        return batcher
@@ -0,0 +1,118 @@
+"""
+Response cache for deterministic XAgent requests
+
+Caches final adapter responses keyed by a hash of the XAgent configuration,
+compiled tool schemas and prompt messages. Entries live in an in-memory LRU
+tier and, optionally, an on-disk SQLite tier shared across processes.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+# Cache sizing: in-memory entries and lifetime of an entry in seconds
+XAGENT_RESPONSE_CACHE_SIZE = int(os.environ.get("XAGENT_RESPONSE_CACHE_SIZE", "1024"))
+XAGENT_RESPONSE_CACHE_TTL = float(os.environ.get("XAGENT_RESPONSE_CACHE_TTL", "86400"))
+
+
+class XAgentResponseCache:
+    """
+    Two-tier (memory LRU + optional SQLite) response cache with TTL
+    """
+
+    def __init__(self, max_entries: int = XAGENT_RESPONSE_CACHE_SIZE,
+                 ttl: float = XAGENT_RESPONSE_CACHE_TTL, path: Optional[str] = None):
+        """
+        Initialize the response cache
+
+        Args:
+            max_entries: Maximum entries kept in memory
+            ttl: Seconds an entry stays valid
+            path: SQLite database file for the on-disk tier (None disables it)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hash the JSON-serializable parts of a request into a cache key"""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None if missing or expired"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+            if self._db is None:
+                return None
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+
+            # Promote disk hits into the memory tier
+            self._store_in_memory(key, expires_at, value)
+            return value
+
+    def set(self, key: str, value: str):
+        """Cache a response under key"""
+        expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._store_in_memory(key, expires_at, value)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._db.commit()
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _store_in_memory(self, key: str, expires_at: float, value: str):
+        """Insert into the memory tier, evicting LRU entries (caller holds the lock)"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,216 @@
+"""
+Token-aware history compaction for multi-agent simulations
+
+Simulation agents keep their whole dialogue as a list of "name: message"
+strings. Sending all of it every turn makes prompt size grow linearly per
+turn. HistoryCompactor keeps the most recent turns verbatim within a token
+budget and folds older turns into a running summary. The summary is updated
+incrementally (only turns that newly left the window are summarized) and
+token counts are cached per message, so per-turn work stays flat.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+# Prompt token budget for the history and the number of turns kept verbatim
+XAGENT_HISTORY_TOKEN_BUDGET = int(os.environ.get("XAGENT_HISTORY_TOKEN_BUDGET", "3000"))
+XAGENT_HISTORY_RECENT_TURNS = int(os.environ.get("XAGENT_HISTORY_RECENT_TURNS", "8"))
+
+# Share of the budget reserved for the summary of older turns
+XAGENT_HISTORY_SUMMARY_RATIO = float(os.environ.get("XAGENT_HISTORY_SUMMARY_RATIO", "0.25"))
+
+# Cached per-message token counts
+XAGENT_TOKEN_COUNT_CACHE_SIZE = int(os.environ.get("XAGENT_TOKEN_COUNT_CACHE_SIZE", "4096"))
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+Summarizer = Callable[[str, List[str]], str]
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """tiktoken encoding for a model, or None when tiktoken is unavailable"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Encodings are downloaded on first use and may be unreachable
+        logging.getLogger(__name__).warning(f"tiktoken encoding unavailable for {model}: {e}")
+        return None
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken, caching counts per text
+    """
+
+    def __init__(self, model: str = "gpt-3.5-turbo", cache_size: int = XAGENT_TOKEN_COUNT_CACHE_SIZE):
+        self.model = model
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        with self._lock:
+            if text in self._cache:
+                self._cache.move_to_end(text)
+                return self._cache[text]
+
+        encoding = _get_encoding(self.model)
+        if encoding is not None:
+            tokens = len(encoding.encode(text, disallowed_special=()))
+        else:
+            # Roughly four characters per token for English text
+            tokens = (len(text) + 3) // 4
+
+        with self._lock:
+            self._cache[text] = tokens
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def truncate(self, text: str, max_tokens: int, keep_end: bool = False) -> str:
+        """Cut text to at most max_tokens, keeping its start (or its end)"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+
+        encoding = _get_encoding(self.model)
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            tokens = tokens[-max_tokens:] if keep_end else tokens[:max_tokens]
+            return encoding.decode(tokens)
+
+        chars = max_tokens * 4
+        return text[-chars:] if keep_end else text[:chars]
+
+
+def extractive_summarizer(counter: TokenCounter, max_tokens: int) -> Summarizer:
+    """
+    Summarizer that needs no LLM call
+
+    Appends the first sentence of each evicted turn to the previous summary
+    and drops the oldest lines once it exceeds max_tokens.
+    """
+    def summarize(previous_summary: str, messages: List[str]) -> str:
+        lines = previous_summary.split("\n") if previous_summary else []
+        for message in messages:
+            first_line = message.strip().split("\n", 1)[0]
+            sentence_end = first_line.find(". ")
+            lines.append(first_line[:sentence_end + 1] if sentence_end > 0 else first_line)
+
+        counts = [counter.count(line) + 1 for line in lines]
+        total = sum(counts)
+        start = 0
+        while total > max_tokens and start < len(lines) - 1:
+            total -= counts[start]
+            start += 1
+        return counter.truncate("\n".join(lines[start:]), max_tokens, keep_end=True)
+
+    return summarize
+
+
+class HistoryCompactor:
+    """
+    Builds budgeted prompts from a growing message history
+    """
+
+    def __init__(
+        self,
+        token_budget: int = XAGENT_HISTORY_TOKEN_BUDGET,
+        recent_turns: int = XAGENT_HISTORY_RECENT_TURNS,
+        model: str = "gpt-3.5-turbo",
+        summarizer: Optional[Summarizer] = None,
+        summary_ratio: float = XAGENT_HISTORY_SUMMARY_RATIO,
+    ):
+        """
+        Initialize the compactor
+
+        Args:
+            token_budget: Maximum tokens for history, summary and suffix
+            recent_turns: Most recent turns kept verbatim (when they fit)
+            model: Model whose tokenizer is used for counting
+            summarizer: Callable (previous_summary, evicted_messages) -> summary;
+                defaults to an extractive summarizer that makes no LLM calls
+            summary_ratio: Share of the budget available to the summary
+        """
+        self.token_budget = token_budget
+        self.recent_turns = max(1, recent_turns)
+        self.counter = TokenCounter(model)
+        self.summary_budget = int(token_budget * summary_ratio)
+        self.summarizer = summarizer or extractive_summarizer(self.counter, self.summary_budget)
+
+        self._summary = ""
+        self._summarized = 0
+        self._last_summarized: Optional[str] = None
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    def reset(self):
+        """Forget the cached summary"""
+        self._summary = ""
+        self._summarized = 0
+        self._last_summarized = None
+
+    def compact(self, messages: List[str], suffix: str = "") -> str:
+        """
+        Build a prompt from messages that fits the token budget
+
+        Args:
+            messages: Full message history, oldest first
+            suffix: Text appended after the history (e.g. the speaker prefix)
+
+        Returns:
+            Newline-joined prompt of the summary, recent turns and suffix
+        """
+        self._check_history(messages)
+
+        available = self.token_budget - self.counter.count(suffix) - self.summary_budget
+        recent_start = max(self._summarized, len(messages) - self.recent_turns)
+
+        # Newest turns first until the verbatim budget is spent; always keep one
+        used = 0
+        start = len(messages)
+        while start > recent_start:
+            tokens = self.counter.count(messages[start - 1]) + 1
+            if used + tokens > available and start < len(messages):
+                break
+            used += tokens
+            start -= 1
+
+        if start > self._summarized:
+            evicted = messages[self._summarized:start]
+            self._summary = self.summarizer(self._summary, evicted)
+            self._summarized = start
+            self._last_summarized = messages[start - 1]
+
+        recent = list(messages[self._summarized:])
+        if recent and used > available:
+            # A single oversized turn; keep its end, which is the freshest part
+            recent[-1] = self.counter.truncate(recent[-1], max(available, 1), keep_end=True)
+
+        lines = [f"{SUMMARY_HEADER}\n{self._summary}"] if self._summary else []
+        return "\n".join(lines + recent + ([suffix] if suffix else []))
+
+    def _check_history(self, messages: List[str]):
+        """Drop the cached summary if the history was reset or rewritten"""
+        if not self._summarized:
+            return
+        if (
+            len(messages) < self._summarized
+            or messages[self._summarized - 1] != self._last_summarized
+        ):
+            self.reset()
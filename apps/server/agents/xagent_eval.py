@@ -0,0 +1,192 @@
+"""
+Concurrent evaluation runner for the XAgent adapter
+
+Fans L3AGIXAgentAdapter.arun out over a local dataset file with a
+configurable number of workers, warm adapters from an XAgentAdapterPool,
+resumable JSONL checkpoints and per-example latency/token metrics. Rate
+limits and rate-limit retries are left to the shared LLM scheduler, where
+examples run at batch priority. A batch-capable llm_backend is
+micro-batched, so concurrent examples share batch calls.
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from agents.xagent_batching import micro_batched
+from agents.xagent_integration import XAgentAdapterPool
+from agents.xagent_scheduler import PRIORITY_BATCH
+
+# Default worker count for evaluation runs
+XAGENT_EVAL_CONCURRENCY = int(os.environ.get("XAGENT_EVAL_CONCURRENCY", "8"))
+
+
+def load_dataset(path: str) -> List[Dict]:
+    """
+    Load evaluation examples from a JSON list or JSONL file
+
+    Each example needs an "input" and may carry an expected "output" and an
+    "id"; examples without an id are numbered by position.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+
+    if content.startswith("["):
+        examples = json.loads(content)
+    else:
+        examples = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    for index, example in enumerate(examples):
+        example.setdefault("id", str(index))
+    return examples
+
+
+class XAgentEvalRunner:
+    """
+    Runs a dataset through the XAgent adapter concurrently
+    """
+
+    def __init__(
+        self,
+        agent_id: str = "eval",
+        adapter_kwargs: Optional[Dict[str, Any]] = None,
+        concurrency: int = XAGENT_EVAL_CONCURRENCY,
+        checkpoint_path: Optional[str] = None,
+        pool: Optional[XAgentAdapterPool] = None,
+    ):
+        """
+        Initialize the evaluation runner
+
+        Args:
+            agent_id: Pool key for the evaluated agent
+            adapter_kwargs: L3AGIXAgentAdapter arguments (config, tools,
+                system_message, llm_backend, ...)
+            concurrency: Number of examples evaluated at once
+            checkpoint_path: JSONL file of finished examples; examples already
+                in it are skipped so interrupted runs can be resumed, while
+                examples that ended in an error are retried
+            pool: Adapter pool (a private pool sized to the concurrency by default)
+        """
+        self.agent_id = agent_id
+        self.adapter_kwargs = dict(adapter_kwargs or {})
+        # Evaluations yield to interactive chat in the shared LLM scheduler
+        self.adapter_kwargs.setdefault("priority", PRIORITY_BATCH)
+        if "llm_backend" in self.adapter_kwargs:
+            self.adapter_kwargs["llm_backend"] = micro_batched(self.adapter_kwargs["llm_backend"])
+        self.concurrency = max(1, concurrency)
+        self.checkpoint_path = checkpoint_path
+        self.pool = pool or XAgentAdapterPool(max_size=self.concurrency)
+
+    async def run(self, examples: List[Dict]) -> Dict:
+        """
+        Evaluate examples and return a report
+
+        Args:
+            examples: Examples with "id", "input" and optional "output"
+
+        Returns:
+            Dict with a "summary" of aggregate metrics and per-example "results"
+        """
+        completed = self._load_checkpoint()
+        pending = [example for example in examples if str(example["id"]) not in completed]
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for example in pending:
+            queue.put_nowait(example)
+
+        results = list(completed.values())
+        checkpoint = open(self.checkpoint_path, "a", encoding="utf-8") if self.checkpoint_path else None
+
+        async def worker():
+            while True:
+                try:
+                    example = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                result = await self._evaluate(example)
+                results.append(result)
+                # Errored examples are evaluated again when the run is resumed
+                if checkpoint is not None and not result["error"]:
+                    checkpoint.write(json.dumps(result) + "\n")
+                    checkpoint.flush()
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*[worker() for _ in range(min(self.concurrency, len(pending)) or 1)])
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        elapsed = time.perf_counter() - started
+
+        order = {str(example["id"]): index for index, example in enumerate(examples)}
+        results.sort(key=lambda result: order.get(result["id"], len(order)))
+
+        return {
+            "summary": self._summarize(results, len(pending), elapsed),
+            "results": results,
+        }
+
+    async def _evaluate(self, example: Dict) -> Dict:
+        """Run a single example (the LLM scheduler retries rate-limit errors)"""
+        with self.pool.lease(self.agent_id, **self.adapter_kwargs) as adapter:
+            started = time.perf_counter()
+            output = await adapter.arun(example["input"])
+            latency = time.perf_counter() - started
+            budget = adapter.last_budget
+
+        error = output if isinstance(output, str) and output.startswith("Error:") else None
+
+        expected = example.get("output")
+        return {
+            "id": str(example["id"]),
+            "input": example["input"],
+            "output": output,
+            "expected": expected,
+            "correct": None if expected is None or error else
+                str(expected).strip().lower() in str(output).lower(),
+            "error": error,
+            "latency_ms": latency * 1000,
+            "tokens": budget.tokens if budget else 0,
+            "iterations": budget.iterations if budget else 0,
+        }
+
+    def _load_checkpoint(self) -> Dict[str, Dict]:
+        """Finished results by example id from the checkpoint file"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+
+        completed = {}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    if not result.get("error"):
+                        completed[str(result["id"])] = result
+        return completed
+
+    @staticmethod
+    def _summarize(results: List[Dict], evaluated: int, elapsed: float) -> Dict:
+        latencies = sorted(result["latency_ms"] for result in results)
+        graded = [result["correct"] for result in results if result["correct"] is not None]
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))]
+
+        return {
+            "examples": len(results),
+            "evaluated_this_run": evaluated,
+            "errors": sum(1 for result in results if result["error"]),
+            "accuracy": sum(graded) / len(graded) if graded else None,
+            "latency_mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+            "latency_p50_ms": percentile(50),
+            "latency_p95_ms": percentile(95),
+            "total_tokens": sum(result["tokens"] for result in results),
+            "wall_seconds": elapsed,
+            "throughput_per_second": evaluated / elapsed if elapsed else 0.0,
+        }
@@ -7,23 +7,427 @@ compatibility with the current L3AGI agent system.
 """
 
 import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
 import os
 import sys
-from typing import List, Dict, Any, Optional
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from uuid import uuid4
 
-# Add XAgent to the Python path
-xagent_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'XAgent')
-sys.path.insert(0, xagent_path)
+from agents.xagent_json_stream import IncrementalJSONParser
+from agents.xagent_memory import XAGENT_MEMORY_LOAD_TIMEOUT, get_memory_executor, load_history, memory_writer
+from agents.xagent_metrics import TokenUsage, normalize_usage, usage_metrics
+from agents.xagent_prompt import PromptAssembler
+from agents.xagent_scheduler import PRIORITY_INTERACTIVE, is_rate_limited, llm_scheduler
+from agents.xagent_singleflight import request_coalescer
+from agents.xagent_tracing import tracer
 
-from XAgent.core import XAgentCoreComponents, XAgentParam
-from XAgent.agent.tool_agent import ToolAgent
-from XAgent.workflow.base_query import AutoGPTQuery
-from XAgent.message_history import Message
-from XAgent.config import CONFIG, ARGS
-from XAgent.function_handler import FunctionHandler
-from XAgent.toolserver_interface import ToolServerInterface
-from XAgent.logs import logger
+# Log a warning when importing XAgent takes longer than this many seconds
+XAGENT_IMPORT_BUDGET = float(os.environ.get("XAGENT_IMPORT_BUDGET", "2.0"))
+
+_xagent: Optional[SimpleNamespace] = None
+_xagent_import_seconds: Optional[float] = None
+_xagent_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_xagent_path() -> str:
+    """Locate the XAgent checkout once (XAGENT_PATH overrides the default)"""
+    return os.path.abspath(os.environ.get("XAGENT_PATH") or os.path.join(
+        os.path.dirname(__file__), '..', '..', '..', '..', 'XAgent'
+    ))
+
+
+def _load_xagent() -> SimpleNamespace:
+    """
+    Import XAgent components on first use
+    
+    Keeps module import cheap for server workers and scripts that never
+    run an adapter, and lets this module load when XAgent is absent.
+    """
+    global _xagent, _xagent_import_seconds
+    if _xagent is not None:
+        return _xagent
+    
+    with _xagent_lock:
+        if _xagent is None:
+            xagent_path = _resolve_xagent_path()
+            if xagent_path not in sys.path:
+                sys.path.insert(0, xagent_path)
+            
+            started = time.perf_counter()
+            from XAgent.core import XAgentCoreComponents, XAgentParam
+            from XAgent.agent.tool_agent import ToolAgent
+            from XAgent.workflow.base_query import AutoGPTQuery
+            from XAgent.message_history import Message
+            from XAgent.config import CONFIG
+            from XAgent.logs import logger as xagent_logger
+            _xagent_import_seconds = time.perf_counter() - started
+            
+            _xagent = SimpleNamespace(
+                XAgentCoreComponents=XAgentCoreComponents,
+                XAgentParam=XAgentParam,
+                ToolAgent=ToolAgent,
+                AutoGPTQuery=AutoGPTQuery,
+                Message=Message,
+                CONFIG=CONFIG,
+                logger=xagent_logger
+            )
+            
+            if _xagent_import_seconds > XAGENT_IMPORT_BUDGET:
+                xagent_logger.warn(
+                    f"XAgent import took {_xagent_import_seconds:.2f}s "
+                    f"(budget {XAGENT_IMPORT_BUDGET:.2f}s)"
+                )
+    return _xagent
+
+
+def xagent_import_seconds() -> Optional[float]:
+    """Seconds spent importing XAgent, or None if it has not been loaded yet"""
+    return _xagent_import_seconds
+
+
+class _XAgentLogger:
+    """Forwards to XAgent's logger, falling back to stdlib logging if XAgent is unavailable"""
+    
+    def __getattr__(self, name):
+        try:
+            return getattr(_load_xagent().logger, name)
+        except ImportError:
+            return getattr(logging.getLogger(__name__), name)
+
+
+logger = _XAgentLogger()
+
+# Adapter pool sizing (number of idle adapters kept warm and their lifetime in seconds)
+XAGENT_POOL_MAX_SIZE = int(os.environ.get("XAGENT_POOL_MAX_SIZE", "64"))
+XAGENT_POOL_TTL = float(os.environ.get("XAGENT_POOL_TTL", "600"))
+
+# Maximum number of per-tool compiled schemas kept in memory
+XAGENT_TOOL_SCHEMA_CACHE_SIZE = int(os.environ.get("XAGENT_TOOL_SCHEMA_CACHE_SIZE", "1024"))
+
+# Blocking XAgent calls run on a bounded executor; timeout is in seconds
+XAGENT_EXECUTOR_MAX_WORKERS = int(os.environ.get("XAGENT_EXECUTOR_MAX_WORKERS", "32"))
+XAGENT_LLM_TIMEOUT = float(os.environ.get("XAGENT_LLM_TIMEOUT", "120"))
+
+# Multi-step loop limits: iterations per request, token budget and wall-clock
+# deadline in seconds (0 disables the token budget and deadline)
+XAGENT_MAX_ITERATIONS = int(os.environ.get("XAGENT_MAX_ITERATIONS", "5"))
+XAGENT_TOKEN_BUDGET = int(os.environ.get("XAGENT_TOKEN_BUDGET", "0"))
+XAGENT_DEADLINE = float(os.environ.get("XAGENT_DEADLINE", "0"))
+
+# Tool calls from a single response run concurrently; timeout is per tool in seconds
+XAGENT_TOOL_MAX_WORKERS = int(os.environ.get("XAGENT_TOOL_MAX_WORKERS", "16"))
+XAGENT_TOOL_TIMEOUT = float(os.environ.get("XAGENT_TOOL_TIMEOUT", "60"))
+
+# Start a streamed function call's tool as soon as its arguments are complete
+XAGENT_EARLY_TOOL_START = os.environ.get("XAGENT_EARLY_TOOL_START", "1") == "1"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide executor used for blocking XAgent calls"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=XAGENT_EXECUTOR_MAX_WORKERS,
+                thread_name_prefix="xagent"
+            )
+        return _executor
+
+
+class CompiledToolSchemas:
+    """
+    Function schemas for a tool set, in dict form and pre-serialized as JSON
+    """
+    
+    def __init__(self, functions: List[Dict], functions_json: str):
+        self.functions = functions
+        self.functions_json = functions_json
+
+
+# Per-tool compiled schemas keyed by tool identity and version
+_tool_schema_cache: "OrderedDict[Tuple, Tuple[Dict, str]]" = OrderedDict()
+_tool_schema_cache_lock = threading.Lock()
+
+
+def _build_tool_invoker(tool) -> Tuple[Optional[Callable[[Any], Any]], bool]:
+    """
+    Return a callable that runs the tool with decoded arguments, and
+    whether that callable is a coroutine function
+    
+    Langchain tools take a single tool_input (dict or str) while plain
+    callables take keyword arguments; the calling convention is resolved
+    once here instead of on every invocation. Langchain tools are dispatched
+    through arun, which awaits async tools and runs sync ones on an
+    executor, since their run is always synchronous.
+    """
+    if callable(getattr(tool, 'arun', None)):
+        runner = tool.arun
+    elif hasattr(tool, 'run'):
+        runner = tool.run
+    elif callable(tool):
+        runner = tool
+    else:
+        return None, False
+    
+    is_async = inspect.iscoroutinefunction(runner) or \
+        inspect.iscoroutinefunction(getattr(runner, '__call__', None))
+    
+    try:
+        parameters = list(inspect.signature(runner).parameters)
+    except (TypeError, ValueError):
+        parameters = []
+    
+    if parameters and parameters[0] == "tool_input":
+        return runner, is_async
+    
+    def invoke(arguments):
+        if isinstance(arguments, dict):
+            return runner(**arguments)
+        return runner(arguments)
+    
+    return invoke, is_async
+
+
+def _build_argument_validator(tool) -> Optional[Callable[[Dict], Dict]]:
+    """Return a validator for the tool's pydantic args_schema, if it has one"""
+    schema = getattr(tool, 'args_schema', None)
+    validate = getattr(schema, 'model_validate', None) or getattr(schema, 'parse_obj', None)
+    if validate is None:
+        return None
+    
+    def validator(arguments: Dict) -> Dict:
+        model = validate(arguments)
+        if hasattr(model, 'model_dump'):
+            return model.model_dump(exclude_unset=True)
+        return model.dict(exclude_unset=True)
+    
+    return validator
+
+
+def _accepts_text_input(tool) -> bool:
+    """Whether the tool's args_schema is a single string field"""
+    fields = getattr(getattr(tool, 'args_schema', None), '__fields__', None)
+    if not fields or len(fields) != 1:
+        return False
+    field = next(iter(fields.values()))
+    return getattr(field, 'type_', getattr(field, 'annotation', None)) is str
+
+
+def _decode_arguments(arguments, accepts_text: bool = False) -> Any:
+    """
+    Decode function call arguments, which the LLM returns as a JSON string
+    
+    Args:
+        arguments: Arguments from the function call
+        accepts_text: Whether the tool takes a single string, which may then
+            be passed as plain text instead of a JSON object
+    
+    Raises:
+        ValueError: If the arguments are not a JSON object
+    """
+    if arguments is None or arguments == "":
+        return {}
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except json.JSONDecodeError as e:
+            if accepts_text:
+                return arguments
+            raise ValueError(f"arguments are not valid JSON ({e})")
+    if isinstance(arguments, dict) or (accepts_text and isinstance(arguments, str)):
+        return arguments
+    raise ValueError("arguments must be a JSON object")
+
+
+class XAgentToolError(Exception):
+    """Raised when a function call cannot be dispatched to a tool"""
+
+
+def _extract_function_calls(response: Dict) -> List[Dict]:
+    """Return every function call in an LLM response, in order"""
+    if response.get('tool_calls'):
+        return [
+            tool_call.get('function', tool_call)
+            for tool_call in response['tool_calls']
+        ]
+    if response.get('function_calls'):
+        return list(response['function_calls'])
+    if response.get('function_call'):
+        return [response['function_call']]
+    return []
+
+
+class _IterationBudget:
+    """
+    Tracks the limits of one multi-step request: iterations, tokens and a
+    wall-clock deadline
+    """
+    
+    def __init__(self, max_iterations: int, token_budget: Optional[int], deadline: Optional[float]):
+        self.max_iterations = max(1, max_iterations)
+        self.token_budget = token_budget or None
+        self.expires_at = time.monotonic() + deadline if deadline else None
+        self.iterations = 0
+        self.tokens = 0
+    
+    def start_iteration(self):
+        self.iterations += 1
+    
+    def add_tokens(self, tokens):
+        self.tokens += normalize_usage(tokens)["total_tokens"]
+    
+    def exhausted(self) -> bool:
+        """Whether another LLM round trip would exceed any limit"""
+        if self.iterations >= self.max_iterations:
+            return True
+        if self.token_budget is not None and self.tokens >= self.token_budget:
+            return True
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+    
+    def timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """Per-call timeout clipped to the remaining wall-clock time"""
+        if self.expires_at is None:
+            return timeout
+        remaining = max(0.0, self.expires_at - time.monotonic())
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+async def _iterate_with_timeout(iterator, timeout: Optional[float]):
+    """
+    Yield from an async iterator until it ends or timeout seconds have passed
+    
+    Raises:
+        asyncio.TimeoutError: If the iterator is still running at the timeout
+    """
+    try:
+        if timeout is None:
+            async for item in iterator:
+                yield item
+            return
+        
+        expires_at = time.monotonic() + timeout
+        while True:
+            try:
+                item = await asyncio.wait_for(
+                    iterator.__anext__(), timeout=max(0.0, expires_at - time.monotonic())
+                )
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await iterator.aclose()
+
+
+class XAgentStreamingUnavailable(RuntimeError):
+    """Raised when no streaming-capable LLM client is available"""
+
+
+# Async OpenAI clients are bound to the event loop they were created on,
+# so they are cached per loop and per (api key, base url)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Any]]" = weakref.WeakKeyDictionary()
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the long-lived event loop that serves synchronous callers"""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever,
+                name="xagent-loop",
+                daemon=True
+            )
+            thread.start()
+            _background_loop = loop
+        return _background_loop
+
+
+def run_coroutine_sync(coro, timeout: Optional[float] = None):
+    """
+    Run a coroutine from synchronous code on the shared background loop
+    
+    Works whether or not the calling thread already runs an event loop, and
+    reuses the same loop (and the clients cached on it) across calls.
+    
+    Args:
+        coro: Coroutine to run
+        timeout: Seconds to wait for the result (None waits forever)
+        
+    Returns:
+        The coroutine's result
+    """
+    loop = _get_background_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        coro.close()
+        raise RuntimeError("run_coroutine_sync cannot be called from the XAgent background loop")
+    
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def _get_async_openai_client(model: str):
+    """Return a cached streaming-capable OpenAI client for the running loop"""
+    try:
+        from openai import AsyncOpenAI
+    except ImportError as e:
+        raise XAgentStreamingUnavailable(f"openai>=1.0 is required for streaming: {e}")
+    
+    try:
+        apiconfig = _load_xagent().CONFIG.get_apiconfig_by_model(model)
+    except Exception:
+        apiconfig = {}
+    
+    api_key = apiconfig.get("api_key") or os.environ.get("OPENAI_API_KEY")
+    base_url = apiconfig.get("base_url") or apiconfig.get("api_base")
+    if not api_key:
+        raise XAgentStreamingUnavailable(f"No API key configured for model {model}")
+    
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    key = (api_key, base_url)
+    if key not in clients:
+        clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    return clients[key]
+
+
+def _rejects_stream_options(error: Exception) -> bool:
+    """Whether a client or an OpenAI-compatible server does not support stream_options"""
+    if isinstance(error, TypeError):
+        return "stream_options" in str(error)
+    return getattr(error, "status_code", None) == 400
+
+
+def _fingerprint(value: Any) -> str:
+    """Stable short hash of a JSON-serializable value"""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
 
 
 class L3AGIXAgentAdapter:
@@ -32,7 +436,19 @@ class L3AGIXAgentAdapter:
     Provides compatibility with existing L3AGI agent interfaces
     """
     
-    def __init__(self, config=None, tools=None, system_message="", memory=None):
+    def __init__(self, config=None, tools=None, system_message="", memory=None,
+                 timeout: Optional[float] = XAGENT_LLM_TIMEOUT,
+                 max_iterations: int = XAGENT_MAX_ITERATIONS,
+                 token_budget: Optional[int] = XAGENT_TOKEN_BUDGET,
+                 deadline: Optional[float] = XAGENT_DEADLINE,
+                 response_cache=None,
+                 llm_backend=None,
+                 agent_id=None,
+                 account_id=None,
+                 priority: int = PRIORITY_INTERACTIVE,
+                 human_name: Optional[str] = None,
+                 ai_name: Optional[str] = None,
+                 auto_save: bool = True):
         """
         Initialize the XAgent adapter
         
@@ -41,12 +457,51 @@ class L3AGIXAgentAdapter:
             tools: List of L3AGI tools
             system_message: System message for the agent
             memory: Memory object (ZepMemory or similar)
+            timeout: Seconds to wait for an LLM round trip (None waits forever)
+            max_iterations: Maximum LLM round trips per request
+            token_budget: Maximum tokens spent per request (None or 0 for no limit)
+            deadline: Wall-clock seconds per request (None or 0 for no limit)
+            response_cache: Optional XAgentResponseCache; only consulted when
+                the configured temperature is 0
+            llm_backend: Optional backend replacing XAgent's ToolAgent and the
+                streaming client (e.g. MockLLMBackend). It must provide
+                async acomplete(request, functions) -> (response, usage) and
+                async generator astream(request, functions) -> deltas, where
+                request holds the completion kwargs and chat messages
+            agent_id: L3AGI agent id, used to attribute token usage
+            account_id: L3AGI account id, used to attribute token usage
+            priority: llm_scheduler priority class of this adapter's calls
+                (PRIORITY_INTERACTIVE, PRIORITY_SIMULATION or PRIORITY_BATCH)
+            human_name: Speaker name saved with the user's messages
+            ai_name: Speaker name saved with the agent's messages
+            auto_save: Whether turns are saved to memory
         """
         self.config = config
-        self.tools = tools or []
+        self.tools = tools
+        self._prompt = PromptAssembler()
         self.system_message = system_message
         self.memory = memory
+        self.timeout = timeout
+        self.max_iterations = max_iterations
+        self.token_budget = token_budget
+        self.deadline = deadline
+        self.response_cache = response_cache
+        self.llm_backend = llm_backend
+        self.agent_id = agent_id
+        self.account_id = account_id
+        self.priority = priority
+        self.human_name = human_name
+        self.ai_name = ai_name
+        self.auto_save = auto_save
         self.session_id = str(uuid4())
+        self.pool_key = None
+        self.last_budget: Optional[_IterationBudget] = None
+        self.last_usage = TokenUsage()
+        self._history: List[Dict] = []
+        # Whether the latest request ended with the model's own answer, and
+        # whether any tool ran on the way there
+        self._final_answer = False
+        self._used_tools = False
         
         # Initialize XAgent components
         self.xagent_components = None
@@ -57,44 +512,102 @@ class L3AGIXAgentAdapter:
         """Initialize XAgent components"""
         if self.is_initialized:
             return
-            
-        try:
-            # Create XAgent parameter object
-            query_data = {
-                "task": self.system_message,
-                "upload_files": [],
-                "role": "Assistant",
-                "mode": "auto"
-            }
-            
-            xagent_param = XAgentParam(
-                config=self._convert_config(),
-                query=AutoGPTQuery(**query_data),
-                newly_created=True
-            )
-            
-            # Initialize core components (simplified for integration)
-            self.xagent_components = XAgentCoreComponents()
-            
-            # Create mock interaction object for initialization
-            from types import SimpleNamespace
-            mock_interaction = SimpleNamespace()
-            mock_interaction.base = SimpleNamespace()
-            mock_interaction.base.interaction_id = self.session_id
-            mock_interaction.logger = logger
-            
-            # Initialize tool agent
-            self.tool_agent = ToolAgent(
-                config=xagent_param.config,
-                prompt_messages=self._create_prompt_messages()
-            )
-            
+        
+        # A custom LLM backend replaces XAgent entirely
+        if self.llm_backend is not None:
             self.is_initialized = True
+            return
             
+        try:
+            with tracer.span("xagent.initialize", session_id=self.session_id):
+                xagent = _load_xagent()
+                
+                # Create XAgent parameter object
+                query_data = {
+                    "task": self.system_message,
+                    "upload_files": [],
+                    "role": "Assistant",
+                    "mode": "auto"
+                }
+                
+                xagent_param = xagent.XAgentParam(
+                    config=self._convert_config(),
+                    query=xagent.AutoGPTQuery(**query_data),
+                    newly_created=True
+                )
+                
+                # Initialize core components (simplified for integration)
+                self.xagent_components = xagent.XAgentCoreComponents()
+                
+                # Create mock interaction object for initialization
+                mock_interaction = SimpleNamespace()
+                mock_interaction.base = SimpleNamespace()
+                mock_interaction.base.interaction_id = self.session_id
+                mock_interaction.logger = xagent.logger
+                
+                # Initialize tool agent
+                self.tool_agent = xagent.ToolAgent(
+                    config=xagent_param.config,
+                    prompt_messages=self._create_prompt_messages()
+                )
+                
+                self.is_initialized = True
+                
         except Exception as e:
             logger.error(f"Failed to initialize XAgent: {e}")
             raise
     
+    @property
+    def tools(self) -> List[Any]:
+        """L3AGI tools bound to this adapter"""
+        return self._tools
+    
+    @tools.setter
+    def tools(self, tools):
+        # Changing the tool set invalidates the compiled schemas
+        self._tools = list(tools or [])
+        self._compiled_tools = None
+        self._tool_index = None
+    
+    @property
+    def system_message(self) -> str:
+        """System prompt that prefixes every request"""
+        return self._prompt.system_message
+    
+    @system_message.setter
+    def system_message(self, system_message):
+        # Rebuild the cached prefix (and ToolAgent prompt) only on a real change
+        if self._prompt.set_system_message(system_message) and getattr(self, "tool_agent", None) is not None:
+            self.tool_agent.prompt_messages = self._create_prompt_messages()
+    
+    def reset(self, tools=None, system_message="", memory=None, session_id=None):
+        """
+        Reset per-session state so a warm adapter can serve a new turn
+        without re-running initialize()
+        
+        Args:
+            tools: List of L3AGI tools for this turn
+            system_message: System message for this turn
+            memory: Memory object for this turn
+            session_id: Session identifier (a new one is generated if omitted)
+        """
+        self.tools = tools
+        self.system_message = system_message
+        self.memory = memory
+        self.session_id = session_id or str(uuid4())
+        self._history = []
+    
+    def config_fingerprint(self) -> str:
+        """Hash of the XAgent configuration this adapter was initialized with"""
+        return _fingerprint(self._convert_config())
+    
+    def tools_fingerprint(self) -> str:
+        """Hash of the tool set (names and classes) bound to this adapter"""
+        return _fingerprint([
+            (getattr(tool, 'name', tool.__class__.__name__), tool.__class__.__qualname__)
+            for tool in self.tools
+        ])
+    
     def _convert_config(self):
         """Convert L3AGI config to XAgent format"""
         # Basic XAgent configuration
@@ -105,58 +618,90 @@ class L3AGIXAgentAdapter:
                 "max_tokens": 2000
             },
             "enable_ask_human_for_help": False,
-            "max_retry_times": 3
+            # A single attempt: llm_scheduler retries rate-limited calls, and
+            # retries inside XAgent would multiply with its own
+            "max_retry_times": 1
         }
         
-        # Override with L3AGI config if available
+        # Override with L3AGI config if available (config objects or plain dicts)
         if self.config:
-            if hasattr(self.config, 'model_name'):
-                xagent_config["default_completion_kwargs"]["model"] = self.config.model_name
-            if hasattr(self.config, 'temperature'):
-                xagent_config["default_completion_kwargs"]["temperature"] = self.config.temperature
+            completion_kwargs = xagent_config["default_completion_kwargs"]
+            for name, key in (("model_name", "model"), ("temperature", "temperature")):
+                if isinstance(self.config, dict):
+                    if name in self.config:
+                        completion_kwargs[key] = self.config[name]
+                elif hasattr(self.config, name):
+                    completion_kwargs[key] = getattr(self.config, name)
                 
         return xagent_config
     
-    def _create_prompt_messages(self) -> List[Message]:
+    def _create_prompt_messages(self) -> List["Message"]:
         """Create XAgent prompt messages from system message"""
-        messages = []
-        if self.system_message:
-            messages.append(Message(
-                role="system",
-                content=self.system_message
-            ))
-        return messages
+        return self._prompt.xagent_messages(_load_xagent().Message)
     
     def _convert_tools_to_xagent_format(self) -> List[Dict]:
         """Convert L3AGI tools to XAgent function format"""
-        xagent_functions = []
-        
-        for tool in self.tools:
-            function_schema = {
-                "name": getattr(tool, 'name', tool.__class__.__name__),
-                "description": getattr(tool, 'description', ''),
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
+        return self._compile_tools().functions
+    
+    def _compile_tools(self) -> CompiledToolSchemas:
+        """
+        Compile the tool set into XAgent function schemas
+        
+        The result is cached on the adapter until the tool set changes, and
+        each tool's schema is cached process-wide by tool identity/version.
+        """
+        if self._compiled_tools is None:
+            schemas = [self._compile_tool_schema(tool) for tool in self.tools]
+            self._compiled_tools = CompiledToolSchemas(
+                functions=[schema for schema, _ in schemas],
+                functions_json="[" + ", ".join(schema_json for _, schema_json in schemas) + "]"
+            )
+        return self._compiled_tools
+    
+    def _compile_tool_schema(self, tool) -> Tuple[Dict, str]:
+        """Return the (dict, JSON) function schema for a single tool"""
+        key = (
+            tool.__class__,
+            getattr(tool, 'name', tool.__class__.__name__),
+            getattr(tool, 'description', ''),
+            getattr(tool, 'args_schema', None),
+            getattr(tool, 'version', None)
+        )
+        
+        with _tool_schema_cache_lock:
+            cached = _tool_schema_cache.get(key)
+            if cached is not None:
+                _tool_schema_cache.move_to_end(key)
+                return cached
+        
+        function_schema = {
+            "name": key[1],
+            "description": key[2],
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
             }
-            
-            # Add tool-specific parameters if available
-            if hasattr(tool, 'args_schema'):
-                schema = tool.args_schema
-                if hasattr(schema, '__fields__'):
-                    for field_name, field in schema.__fields__.items():
-                        function_schema["parameters"]["properties"][field_name] = {
-                            "type": self._get_json_type(field.type_),
-                            "description": field.field_info.description or ""
-                        }
-                        if field.required:
-                            function_schema["parameters"]["required"].append(field_name)
-            
-            xagent_functions.append(function_schema)
+        }
+        
+        # Add tool-specific parameters if available
+        if hasattr(tool, 'args_schema'):
+            schema = tool.args_schema
+            if hasattr(schema, '__fields__'):
+                for field_name, field in schema.__fields__.items():
+                    function_schema["parameters"]["properties"][field_name] = {
+                        "type": self._get_json_type(field.type_),
+                        "description": field.field_info.description or ""
+                    }
+                    if field.required:
+                        function_schema["parameters"]["required"].append(field_name)
         
-        return xagent_functions
+        compiled = (function_schema, json.dumps(function_schema))
+        with _tool_schema_cache_lock:
+            _tool_schema_cache[key] = compiled
+            while len(_tool_schema_cache) > XAGENT_TOOL_SCHEMA_CACHE_SIZE:
+                _tool_schema_cache.popitem(last=False)
+        return compiled
     
     def _get_json_type(self, python_type) -> str:
         """Convert Python type to JSON schema type"""
@@ -174,6 +719,11 @@ class L3AGIXAgentAdapter:
         """
         Async run method to execute a prompt with XAgent
         
+        Runs a bounded plan -> act -> observe loop: tool results are fed
+        back to the model until it answers, repeats a call it already made,
+        or the iteration, token or wall-clock budget runs out. In the last
+        two cases the latest tool result is returned.
+        
         Args:
             prompt: User input prompt
             
@@ -182,42 +732,281 @@ class L3AGIXAgentAdapter:
         """
         await self.initialize()
         
+        self.last_budget = None
+        self.last_usage = TokenUsage()
+        self._final_answer = False
+        self._used_tools = False
         try:
-            # Convert tools to XAgent format
-            functions = self._convert_tools_to_xagent_format()
+            self._history = await self._load_history()
             
-            # Create additional messages for the prompt
-            additional_messages = [Message(role="user", content=prompt)]
+            cache_key = self._response_cache_key(prompt)
+            cached = self.response_cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                result = cached
+            else:
+                result = await self._execute(prompt)
+                
+                if cache_key is not None and self._cacheable(result):
+                    self.response_cache.set(cache_key, result)
             
-            # Use XAgent's ToolAgent to process the request
-            placeholders = {
-                "system": {
-                    "task": prompt,
-                    "tools": str(functions)
-                }
-            }
+            # Persisted off the request path
+            self._save_turn(prompt, result)
+            return result
             
-            response, tokens = self.tool_agent.parse(
+        except asyncio.TimeoutError:
+            logger.error(f"XAgent execution timed out after {self.timeout}s")
+            return f"Error: XAgent execution timed out after {self.timeout}s"
+        except Exception as e:
+            logger.error(f"XAgent execution failed: {e}")
+            return f"Error: {str(e)}"
+    
+    async def _execute(self, prompt: str) -> str:
+        """Run the plan -> act -> observe loop for a prompt"""
+        # Convert tools to XAgent format
+        compiled_tools = self._compile_tools()
+        functions = compiled_tools.functions
+        
+        # Create additional messages for the prompt, after the chat history
+        additional_messages = self._history + [{"role": "user", "content": prompt}]
+        
+        # Use XAgent's ToolAgent to process the request
+        placeholders = {
+            "system": {
+                "task": prompt,
+                "tools": compiled_tools.functions_json
+            }
+        }
+        
+        budget = self.last_budget = self._create_budget()
+        seen_calls = set()
+        observation = ""
+        
+        while True:
+            budget.start_iteration()
+            response, tokens = await self._aparse(
                 placeholders=placeholders,
                 functions=functions,
-                additional_messages=additional_messages
+                additional_messages=additional_messages,
+                timeout=budget.timeout(self.timeout)
             )
+            budget.add_tokens(tokens)
             
             # Extract the response content
-            if isinstance(response, dict):
+            if not isinstance(response, dict):
+                return str(response)
+            
+            function_calls = _extract_function_calls(response)
+            if not function_calls:
                 if 'content' in response:
+                    self._final_answer = True
                     return response['content']
-                elif 'function_call' in response:
-                    # Handle function call responses
-                    return self._handle_function_call(response['function_call'])
-                else:
-                    return str(response)
-            else:
                 return str(response)
-                
+            
+            # Stop if the model repeats a call it has already observed
+            call_key = _fingerprint(function_calls)
+            if call_key in seen_calls:
+                return observation
+            seen_calls.add(call_key)
+            self._used_tools = True
+            
+            # Handle function call responses, running independent calls concurrently
+            results = await tool_executor.execute(self, function_calls)
+            observation = "\n\n".join(results)
+            
+            if budget.exhausted():
+                return observation
+            
+            additional_messages.extend(self._create_observation_messages(function_calls, results))
+    
+    async def _load_history(self) -> List[Dict]:
+        """
+        Load chat history from memory without blocking the event loop
+        
+        A slow or failing memory backend never fails the request; the turn
+        proceeds without history.
+        """
+        if self.memory is None:
+            return []
+        
+        try:
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(
+                    get_memory_executor(), load_history, self.memory
+                ),
+                timeout=XAGENT_MEMORY_LOAD_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Loading chat history timed out after {XAGENT_MEMORY_LOAD_TIMEOUT}s")
         except Exception as e:
-            logger.error(f"XAgent execution failed: {e}")
-            return f"Error: {str(e)}"
+            logger.error(f"Failed to load chat history: {e}")
+        return []
+    
+    def _save_turn(self, prompt: str, result: str):
+        """Queue the turn for the memory writer with this turn's speaker settings"""
+        memory_writer.save(self.memory, prompt, result, human_name=self.human_name,
+                           ai_name=self.ai_name, auto_save=self.auto_save)
+    
+    def _response_cache_key(self, prompt: str) -> Optional[str]:
+        """
+        Cache key for a prompt, or None if the response cache does not apply
+        
+        Only deterministic (temperature 0) configurations are cached.
+        """
+        if self.response_cache is None:
+            return None
+        
+        xagent_config = self._convert_config()
+        if xagent_config["default_completion_kwargs"].get("temperature") != 0:
+            return None
+        
+        return self.response_cache.make_key(
+            xagent_config,
+            self._compile_tools().functions_json,
+            self._create_chat_messages(prompt)
+        )
+    
+    def _cacheable(self, result: str) -> bool:
+        """
+        Whether a result may be cached
+        
+        Only the model's own non-empty final answer to a request that ran no
+        tools is; tool results returned on budget or repeat exits, tool error
+        strings and answers built on tool results (whose tools must run again
+        next time) are not.
+        """
+        return self._final_answer and not self._used_tools and bool(result and result.strip())
+    
+    def _round_trip_fingerprint(self, request: Dict, functions: List[Dict]) -> str:
+        """
+        Identity of one LLM round trip for coalescing
+        
+        Covers everything the response depends on: the LLM backend, the
+        completion settings and full chat messages, and the function
+        schemas. The account is included since its credentials make the call.
+        """
+        return _fingerprint([
+            self.account_id,
+            id(self.llm_backend) if self.llm_backend is not None else None,
+            request,
+            functions
+        ])
+    
+    def _create_budget(self) -> _IterationBudget:
+        """Create the iteration budget for a single request"""
+        return _IterationBudget(self.max_iterations, self.token_budget, self.deadline)
+    
+    def _create_observation_messages(self, function_calls: List[Dict], results: List[str]) -> List[Dict]:
+        """Create the messages that feed tool results back to the model"""
+        messages = []
+        for function_call, result in zip(function_calls, results):
+            arguments = function_call.get('arguments', {})
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments, default=str)
+            messages.append({
+                "role": "assistant",
+                "content": f"Calling tool {function_call.get('name', '')} with arguments {arguments}"
+            })
+            messages.append({
+                "role": "user",
+                "content": f"Result of tool {function_call.get('name', '')}:\n{result}"
+            })
+        return messages
+    
+    async def _aparse(self, placeholders: Dict, functions: List[Dict], additional_messages: List[Dict],
+                      timeout: Optional[float] = None):
+        """
+        Run one LLM round trip without blocking the event loop
+        
+        XAgent's blocking ToolAgent.parse runs on the bounded executor. On
+        timeout or cancellation the caller stops waiting immediately; the
+        worker thread finishes the call in the background and its result is
+        discarded. A custom llm_backend is awaited directly. Calls are
+        admitted (and rate-limit errors retried) by llm_scheduler; the
+        timeout includes time spent queued there. Identical concurrent round
+        trips share one call, accounted to the request that made it; tools
+        and adapter state stay with each request.
+        
+        Args:
+            placeholders: ToolAgent prompt placeholders
+            functions: Function schemas available to the model
+            additional_messages: Chat messages following the system prompt
+            timeout: Seconds to wait (defaults to the adapter timeout)
+            
+        Returns:
+            Tuple of (response, tokens)
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        completion_kwargs = self._convert_config()["default_completion_kwargs"]
+        model = completion_kwargs["model"]
+        messages = self._prompt.chat_messages(None, additional_messages)
+        estimated_tokens = self._estimate_tokens(messages, functions, completion_kwargs)
+        request = dict(completion_kwargs, messages=messages)
+        
+        if self.llm_backend is not None:
+            def make_call():
+                return self.llm_backend.acomplete(request, functions)
+        else:
+            Message = _load_xagent().Message
+            parse = functools.partial(
+                self.tool_agent.parse,
+                placeholders=placeholders,
+                functions=functions,
+                additional_messages=[
+                    Message(role=message["role"], content=message["content"])
+                    for message in additional_messages
+                ]
+            )
+            
+            def make_call():
+                return asyncio.get_running_loop().run_in_executor(_get_executor(), parse)
+        
+        # Time the admitted attempt, not the wait in the scheduler queue
+        attempt_started = []
+        
+        def timed_call():
+            attempt_started.append(time.perf_counter())
+            return make_call()
+        
+        async def round_trip():
+            # Runs only in the request that leads the shared call
+            response, tokens = await llm_scheduler.run(model, timed_call, estimated_tokens, self.priority)
+            usage = self._record_usage(tokens, time.perf_counter() - attempt_started[-1], model)
+            llm_scheduler.settle(model, estimated_tokens, usage["total_tokens"])
+            return response, tokens
+        
+        with tracer.span("xagent.llm_call", model=model) as span:
+            response, tokens = await asyncio.wait_for(
+                request_coalescer.run(self._round_trip_fingerprint(request, functions), round_trip),
+                timeout=timeout
+            )
+            span.set_attribute("total_tokens", normalize_usage(tokens)["total_tokens"])
+            span.set_attribute("coalesced", not attempt_started)
+        return response, tokens
+    
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict], functions: List[Dict], completion_kwargs: Dict) -> int:
+        """Rough prompt size (four characters per token) plus the completion limit"""
+        characters = sum(len(str(message.get("content") or "")) for message in messages)
+        characters += len(json.dumps(functions)) if functions else 0
+        return characters // 4 + int(completion_kwargs.get("max_tokens") or 0)
+    
+    def _record_usage(self, tokens, duration: float, model: str, metrics: bool = True):
+        """
+        Account one LLM call to this request and, unless metrics is False
+        (the caller records them itself), to the process-wide metrics
+        """
+        if isinstance(tokens, dict) and tokens.get("model"):
+            model = tokens["model"]
+        
+        usage = normalize_usage(tokens)
+        self.last_usage.add(usage, duration, model)
+        if metrics:
+            usage_metrics.record(usage, duration=duration, model=model, **self._usage_labels())
+        return usage
+    
+    def _usage_labels(self) -> Dict[str, Any]:
+        """Attribution of this adapter's LLM calls in usage_metrics"""
+        return {"session_id": self.session_id, "agent_id": self.agent_id, "account_id": self.account_id}
     
     def run(self, prompt: str) -> str:
         """
@@ -230,62 +1019,569 @@ class L3AGIXAgentAdapter:
             Agent response string
         """
         try:
-            # Run async method in event loop
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If already in an event loop, create a new task
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, self.arun(prompt))
-                    return future.result()
-            else:
-                return loop.run_until_complete(self.arun(prompt))
+            # Run async method on the shared background loop
+            return run_coroutine_sync(self.arun(prompt))
         except Exception as e:
             logger.error(f"XAgent sync execution failed: {e}")
             return f"Error: {str(e)}"
     
+    def _get_tool_index(self) -> Dict[str, Tuple[Optional[Callable], Optional[Callable], bool, bool]]:
+        """
+        Return the name -> (invoker, validator, accepts_text, is_async)
+        dispatch table for the tool set
+        
+        Built once per tool set; the first tool registered under a name wins.
+        """
+        if self._tool_index is None:
+            index = {}
+            for tool in self.tools:
+                name = getattr(tool, 'name', tool.__class__.__name__)
+                if name not in index:
+                    invoke, is_async = _build_tool_invoker(tool)
+                    index[name] = (invoke, _build_argument_validator(tool), _accepts_text_input(tool), is_async)
+            self._tool_index = index
+        return self._tool_index
+    
+    def _prepare_function_call(self, function_call: Dict) -> Tuple[Callable, Any, bool]:
+        """
+        Resolve a function call to (invoker, decoded arguments, is_async)
+        
+        Raises:
+            XAgentToolError: If the tool is unknown, not callable or the
+                arguments fail validation
+        """
+        function_name = function_call.get('name', '')
+        
+        entry = self._get_tool_index().get(function_name)
+        if entry is None:
+            raise XAgentToolError(f"Tool {function_name} not found")
+        
+        invoke, validate, accepts_text, is_async = entry
+        if invoke is None:
+            raise XAgentToolError(f"Tool {function_name} is not callable")
+        
+        try:
+            arguments = _decode_arguments(function_call.get('arguments'), accepts_text)
+            if validate and isinstance(arguments, dict):
+                arguments = validate(arguments)
+        except Exception as e:
+            raise XAgentToolError(f"Error executing tool {function_name}: {str(e)}")
+        
+        return invoke, arguments, is_async
+    
     def _handle_function_call(self, function_call: Dict) -> str:
         """Handle function call execution"""
         function_name = function_call.get('name', '')
-        arguments = function_call.get('arguments', {})
-        
-        # Find and execute the corresponding tool
-        for tool in self.tools:
-            tool_name = getattr(tool, 'name', tool.__class__.__name__)
-            if tool_name == function_name:
-                try:
-                    if hasattr(tool, 'run'):
-                        result = tool.run(**arguments)
-                    elif hasattr(tool, '__call__'):
-                        result = tool(**arguments)
-                    else:
-                        result = f"Tool {function_name} is not callable"
-                    
-                    return str(result)
-                except Exception as e:
-                    return f"Error executing tool {function_name}: {str(e)}"
-        
-        return f"Tool {function_name} not found"
+        
+        try:
+            invoke, arguments, is_async = self._prepare_function_call(function_call)
+            if is_async:
+                return str(run_coroutine_sync(invoke(arguments)))
+            return str(invoke(arguments))
+        except XAgentToolError as e:
+            return str(e)
+        except Exception as e:
+            return f"Error executing tool {function_name}: {str(e)}"
     
     async def astream(self, prompt: str):
         """
         Async streaming method for XAgent responses
         
+        Content deltas are yielded as soon as the LLM produces them. Function
+        call argument deltas are parsed incrementally and the tool starts as
+        soon as the arguments are complete, while the rest of the response
+        still streams. Its result is fed back to the model, within the same
+        iteration and wall-clock budget as arun. If the budget runs out, or
+        the model repeats a call it already made, the latest tool result
+        itself is yielded. Each LLM round trip, including time queued in
+        llm_scheduler, is bounded by the adapter timeout and the remaining
+        deadline, as in arun. The upstream stream is only read as
+        fast as the caller consumes chunks; an identical concurrent round
+        trip replays the chunks already read instead of calling the LLM
+        again, while tools still run for each request.
+        
         Args:
             prompt: User input prompt
             
         Yields:
             Response chunks
         """
-        response = await self.arun(prompt)
+        await self.initialize()
+        
+        completion_kwargs = dict(self._convert_config()["default_completion_kwargs"])
+        try:
+            client = None
+            if self.llm_backend is None:
+                client = _get_async_openai_client(completion_kwargs["model"])
+        except XAgentStreamingUnavailable as e:
+            # Fall back to a single chunk from the non-streaming path
+            logger.error(f"XAgent streaming unavailable, falling back to arun: {e}")
+            yield await self.arun(prompt)
+            return
+        
+        self.last_budget = None
+        self.last_usage = TokenUsage()
+        self._final_answer = False
+        self._used_tools = False
+        self._history = await self._load_history()
+        cache_key = self._response_cache_key(prompt)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self._save_turn(prompt, cached)
+                yield cached
+                return
+        
+        chunks = []
+        try:
+            async for chunk in self._astream_steps(client, completion_kwargs, prompt):
+                chunks.append(chunk)
+                yield chunk
+        except asyncio.TimeoutError:
+            logger.error(f"XAgent streaming timed out after {self.timeout}s")
+            yield f"Error: XAgent execution timed out after {self.timeout}s"
+            return
+        
+        result = "".join(chunks)
+        if cache_key is not None and self._cacheable(result):
+            self.response_cache.set(cache_key, result)
+        self._save_turn(prompt, result)
+    
+    async def _astream_steps(self, client, completion_kwargs: Dict, prompt: str):
+        """Stream the plan -> act -> observe loop for a prompt"""
+        messages = self._create_chat_messages(prompt)
+        functions = self._convert_tools_to_xagent_format()
+        budget = self.last_budget = self._create_budget()
+        seen_calls = set()
+        observation = ""
+        early_tool = None
         
-        # Simple streaming simulation - split response into chunks
-        words = response.split()
-        for i, word in enumerate(words):
-            if i < len(words) - 1:
-                yield word + " "
+        try:
+            while True:
+                budget.start_iteration()
+                function_name = None
+                arguments = IncrementalJSONParser()
+                early_tool = None
+                early_arguments = None
+                
+                deltas = _iterate_with_timeout(
+                    self._stream_chat_completion(
+                        client,
+                        # A copy, since a shared stream may outlive this step
+                        dict(completion_kwargs, messages=list(messages)),
+                        functions
+                    ),
+                    budget.timeout(self.timeout)
+                )
+                with tracer.span("xagent.llm_stream", model=completion_kwargs["model"]) as span:
+                    async for delta in deltas:
+                        if delta.get("content"):
+                            yield delta["content"]
+                        
+                        if delta.get("usage"):
+                            budget.add_tokens(delta["usage"])
+                            span.set_attribute("total_tokens", normalize_usage(delta["usage"])["total_tokens"])
+                        
+                        function_call = delta.get("function_call")
+                        if function_call:
+                            if function_call.get("name"):
+                                function_name = function_call["name"]
+                            if function_call.get("arguments") and arguments.feed(function_call["arguments"]) \
+                                    and early_tool is None:
+                                # Overlap the tool with the rest of the stream
+                                early_tool = self._start_tool_early(function_name, arguments, seen_calls)
+                                early_arguments = arguments.text
+                                span.set_attribute("early_tool_start", early_tool is not None)
+                
+                if not function_name:
+                    self._final_answer = True
+                    return
+                
+                function_call = {"name": function_name, "arguments": arguments.text}
+                if early_tool is not None and not arguments.ready:
+                    # A started tool cannot be taken back (sync tools keep
+                    # running when cancelled), so the call stands as started
+                    logger.warn(f"Ignoring text streamed after the arguments of {function_name}")
+                    function_call["arguments"] = early_arguments
+                call_key = _fingerprint(function_call)
+                if call_key in seen_calls:
+                    # The model repeats a call; answer with what it already observed
+                    yield observation
+                    return
+                seen_calls.add(call_key)
+                self._used_tools = True
+                
+                if early_tool is not None:
+                    results = await early_tool
+                else:
+                    results = await tool_executor.execute(self, [function_call])
+                early_tool = None
+                observation = results[0]
+                
+                if budget.exhausted():
+                    yield observation
+                    return
+                
+                # Feed the tool result back to the model and stream its next step
+                messages.append({"role": "assistant", "content": None, "function_call": function_call})
+                messages.append({"role": "function", "name": function_name, "content": results[0]})
+        finally:
+            if early_tool is not None and not early_tool.done():
+                early_tool.cancel()
+    
+    def _start_tool_early(self, function_name: Optional[str], arguments: IncrementalJSONParser,
+                          seen_calls: set) -> Optional[asyncio.Task]:
+        """
+        Start a streamed function call whose arguments are complete
+        
+        Only calls that resolve to a tool, decode to an object and pass the
+        tool's argument validation are started, and never a call the model
+        already made (the loop stops on repeats instead).
+        
+        Returns:
+            Task resolving to the tool results, or None if not started
+        """
+        if not XAGENT_EARLY_TOOL_START or not function_name:
+            return None
+        
+        function_call = {"name": function_name, "arguments": arguments.text}
+        if _fingerprint(function_call) in seen_calls:
+            return None
+        
+        try:
+            if not isinstance(arguments.value(), dict):
+                return None
+            self._prepare_function_call(function_call)
+        except (ValueError, XAgentToolError):
+            return None
+        
+        return asyncio.ensure_future(tool_executor.execute(self, [function_call]))
+    
+    def _create_chat_messages(self, prompt: Optional[str]) -> List[Dict]:
+        """Create OpenAI-style chat messages (system prompt, chat history, then the user prompt if given)"""
+        return self._prompt.chat_messages(prompt, history=self._history)
+    
+    async def _stream_chat_completion(self, client, request: Dict, functions: List[Dict]):
+        """
+        Stream chat completion deltas from the LLM
+        
+        Identical concurrent round trips share one LLM stream, accounted to
+        the request that opened it; the others replay its deltas.
+        
+        Args:
+            client: Async OpenAI client (unused when an llm_backend is set)
+            request: Completion kwargs including the chat messages
+            functions: Function schemas available to the model
+            
+        Yields:
+            Delta dicts with "content", partial "function_call" and/or "usage"
+        """
+        started = time.perf_counter()
+        opened = []
+        
+        def open_stream():
+            opened.append(True)
+            return self._llm_stream(client, self.llm_backend, request, functions, self.priority,
+                                    self._usage_labels())
+        
+        stream = request_coalescer.stream(self._round_trip_fingerprint(request, functions), open_stream)
+        try:
+            async for delta in stream:
+                if delta.get("usage") and opened:
+                    self._record_usage(delta["usage"], time.perf_counter() - started, request["model"],
+                                       metrics=False)
+                yield delta
+        finally:
+            await stream.aclose()
+    
+    @staticmethod
+    async def _llm_stream(client, llm_backend, request: Dict, functions: List[Dict], priority: int,
+                          usage_labels: Dict[str, Any]):
+        """
+        Stream the deltas of one LLM call
+        
+        The stream may outlive the request that opened it (coalesced
+        requests keep reading it), so it touches no adapter state; its
+        usage goes to the scheduler and to usage_metrics under usage_labels.
+        """
+        model = request["model"]
+        estimated_tokens = L3AGIXAgentAdapter._estimate_tokens(request["messages"], functions, request)
+        started = time.perf_counter()
+        
+        def record(tokens: Dict):
+            usage = normalize_usage(tokens)
+            llm_scheduler.settle(model, estimated_tokens, usage["total_tokens"])
+            usage_metrics.record(usage, duration=time.perf_counter() - started,
+                                 model=tokens.get("model") or model, **usage_labels)
+        
+        if llm_backend is not None:
+            await llm_scheduler.acquire(model, estimated_tokens, priority)
+            async for delta in llm_backend.astream(request, functions):
+                if delta.get("usage"):
+                    record(delta["usage"])
+                yield delta
+            return
+        
+        request = dict(request, stream=True, stream_options={"include_usage": True})
+        if functions:
+            request["functions"] = functions
+        
+        # Rate-limit errors surface when the stream is opened, before any delta
+        attempt = 0
+        while True:
+            await llm_scheduler.acquire(model, estimated_tokens, priority)
+            try:
+                stream = await client.chat.completions.create(**request)
+                break
+            except Exception as e:
+                if "stream_options" in request and _rejects_stream_options(e):
+                    # Older clients and servers stream without a usage chunk
+                    del request["stream_options"]
+                    continue
+                if not is_rate_limited(e) or attempt >= llm_scheduler.max_retries:
+                    raise
+                attempt += 1
+                await asyncio.sleep(llm_scheduler.report_rate_limited(model, attempt))
+        llm_scheduler.report_success(model)
+        
+        async for chunk in stream:
+            # With include_usage the final chunk carries usage and no choices
+            if getattr(chunk, "usage", None):
+                usage = normalize_usage(chunk.usage)
+                record(usage)
+                yield {"usage": usage}
+            if not chunk.choices:
+                continue
+            
+            delta = chunk.choices[0].delta
+            result = {}
+            if delta.content:
+                result["content"] = delta.content
+            if delta.function_call:
+                result["function_call"] = {
+                    "name": delta.function_call.name,
+                    "arguments": delta.function_call.arguments
+                }
+            if result:
+                yield result
+
+
+class XAgentToolExecutor:
+    """
+    Executes the function calls of a single LLM response concurrently
+    
+    Async tools run on the event loop and sync tools on a bounded thread
+    pool. Each call has its own timeout, and results are returned in the
+    order the calls were made, so a multi-tool turn takes as long as its
+    slowest tool.
+    """
+    
+    def __init__(self, max_workers: int = XAGENT_TOOL_MAX_WORKERS,
+                 timeout: Optional[float] = XAGENT_TOOL_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    async def execute(self, adapter: L3AGIXAgentAdapter, function_calls: List[Dict]) -> List[str]:
+        """
+        Run function calls against the adapter's tools
+        
+        Args:
+            adapter: Adapter whose tool index resolves the calls
+            function_calls: Function calls with "name" and "arguments"
+            
+        Returns:
+            One result string per function call, in call order
+        """
+        return list(await asyncio.gather(*[
+            self._execute_one(adapter, function_call)
+            for function_call in function_calls
+        ]))
+    
+    async def _execute_one(self, adapter: L3AGIXAgentAdapter, function_call: Dict) -> str:
+        """Run a single function call, converting failures to result strings"""
+        function_name = function_call.get('name', '')
+        
+        with tracer.span("xagent.tool", tool=function_name) as span:
+            result = await self._invoke(adapter, function_call, function_name)
+            if result.startswith("Error"):
+                span.set_attribute("error", result)
+            return result
+    
+    async def _invoke(self, adapter: L3AGIXAgentAdapter, function_call: Dict, function_name: str) -> str:
+        try:
+            invoke, arguments, is_async = adapter._prepare_function_call(function_call)
+            
+            if is_async:
+                call = invoke(arguments)
             else:
-                yield word
+                call = asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(),
+                    functools.partial(invoke, arguments)
+                )
+            
+            return str(await asyncio.wait_for(call, timeout=self.timeout))
+        except XAgentToolError as e:
+            return str(e)
+        except asyncio.TimeoutError:
+            return f"Error executing tool {function_name}: timed out after {self.timeout}s"
+        except Exception as e:
+            return f"Error executing tool {function_name}: {str(e)}"
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the thread pool for sync tools, creating it on first use"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="xagent-tool"
+                )
+            return self._executor
+
+
+# Process-wide tool executor shared by all adapters
+tool_executor = XAgentToolExecutor()
+
+
+# Adapter settings that are not part of the pool key and are applied on reuse
+_PER_TURN_SETTINGS = (
+    "account_id", "timeout", "max_iterations", "token_budget", "deadline",
+    "response_cache", "priority", "human_name", "ai_name", "auto_save",
+)
+
+
+class XAgentAdapterPool:
+    """
+    Pool of warm L3AGIXAgentAdapter instances
+    
+    Adapters are keyed by (agent id, config fingerprint, tool set hash, LLM
+    backend) and checked out exclusively for the duration of a turn. Idle adapters are
+    evicted least-recently-used first once the pool exceeds max_size, and
+    dropped once they have been idle for longer than ttl seconds.
+    """
+    
+    def __init__(self, max_size: int = XAGENT_POOL_MAX_SIZE, ttl: float = XAGENT_POOL_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._idle: "OrderedDict[Tuple, List[Tuple[float, L3AGIXAgentAdapter]]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self, agent_id, config=None, tools=None, system_message="", memory=None,
+                session_id=None, **adapter_kwargs) -> L3AGIXAgentAdapter:
+        """
+        Check out an adapter for a single turn, reusing a warm one when possible
+        
+        Args:
+            agent_id: Identifier of the L3AGI agent
+            config: L3AGI configuration object
+            tools: List of L3AGI tools
+            system_message: System message for the agent
+            memory: Memory object (ZepMemory or similar)
+            session_id: Session identifier for this turn
+            adapter_kwargs: Extra L3AGIXAgentAdapter arguments; they also
+                override the settings of a reused adapter
+            
+        Returns:
+            Adapter reset for this turn; hand it back with release()
+        """
+        adapter = L3AGIXAgentAdapter(
+            config=config,
+            tools=tools,
+            system_message=system_message,
+            memory=memory,
+            agent_id=agent_id,
+            **adapter_kwargs
+        )
+        key = (str(agent_id), adapter.config_fingerprint(), adapter.tools_fingerprint(),
+               id(adapter.llm_backend) if adapter.llm_backend is not None else None)
+        
+        with self._lock:
+            self._evict_expired()
+            bucket = self._idle.get(key)
+            if bucket:
+                _, pooled = bucket.pop()
+                self._size -= 1
+                if not bucket:
+                    del self._idle[key]
+                pooled.reset(
+                    tools=tools,
+                    system_message=system_message,
+                    memory=memory,
+                    session_id=session_id
+                )
+                # Per-turn settings come from this caller, not the previous one
+                for name in _PER_TURN_SETTINGS:
+                    setattr(pooled, name, getattr(adapter, name))
+                return pooled
+        
+        if session_id:
+            adapter.session_id = session_id
+        adapter.pool_key = key
+        return adapter
+    
+    def release(self, adapter: L3AGIXAgentAdapter):
+        """Return an adapter to the pool once the turn has finished"""
+        if adapter.pool_key is None:
+            return
+        
+        # Drop references to per-turn state while idle
+        adapter.memory = None
+        
+        with self._lock:
+            self._idle.setdefault(adapter.pool_key, []).append((time.monotonic(), adapter))
+            self._idle.move_to_end(adapter.pool_key)
+            self._size += 1
+            
+            while self._size > self.max_size:
+                key, bucket = next(iter(self._idle.items()))
+                bucket.pop(0)
+                self._size -= 1
+                if not bucket:
+                    del self._idle[key]
+    
+    @contextmanager
+    def lease(self, agent_id, config=None, tools=None, system_message="", memory=None,
+              session_id=None, **adapter_kwargs):
+        """Context manager wrapping acquire() and release()"""
+        adapter = self.acquire(
+            agent_id,
+            config=config,
+            tools=tools,
+            system_message=system_message,
+            memory=memory,
+            session_id=session_id,
+            **adapter_kwargs
+        )
+        try:
+            yield adapter
+        finally:
+            self.release(adapter)
+    
+    def clear(self):
+        """Drop all idle adapters"""
+        with self._lock:
+            self._idle.clear()
+            self._size = 0
+    
+    def __len__(self):
+        return self._size
+    
+    def _evict_expired(self):
+        """Drop idle adapters older than ttl (caller holds the lock)"""
+        deadline = time.monotonic() - self.ttl
+        for key in list(self._idle.keys()):
+            bucket = [entry for entry in self._idle[key] if entry[0] >= deadline]
+            self._size -= len(self._idle[key]) - len(bucket)
+            if bucket:
+                self._idle[key] = bucket
+            else:
+                del self._idle[key]
+
+
+# Process-wide adapter pool shared by the conversational and simulation agents
+adapter_pool = XAgentAdapterPool()
 
 
 class XAgentStreamingResponse:
@@ -0,0 +1,92 @@
+"""
+Incremental parsing of streamed function call arguments
+
+The LLM streams function call arguments as JSON text in arbitrary pieces.
+IncrementalJSONParser scans each piece once, tracking string and nesting
+state, so the adapter learns the moment the arguments object is complete
+(usually before the stream itself ends) without re-parsing the buffer on
+every delta.
+"""
+
+import json
+from typing import Any, List
+
+_OPENING = "{["
+_CLOSING = "}]"
+
+
+class IncrementalJSONParser:
+    """
+    Detects the end of a streamed JSON object or array
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.complete = False
+        self.invalid = False
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add a streamed piece of the JSON text
+
+        Args:
+            chunk: Next piece of the text
+
+        Returns:
+            Whether the top-level object or array is complete and nothing
+            but whitespace has followed it
+        """
+        self._chunks.append(chunk)
+        for char in chunk:
+            if self.invalid:
+                break
+            if self.complete:
+                if not char.isspace():
+                    self.invalid = True
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in _OPENING:
+                self._depth += 1
+            elif char in _CLOSING:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.complete = True
+                elif self._depth < 0:
+                    self.invalid = True
+            elif self._depth == 0 and not char.isspace():
+                # Only objects and arrays have a detectable end
+                self.invalid = True
+        return self.ready
+
+    @property
+    def ready(self) -> bool:
+        """Whether a complete value has been received"""
+        return self.complete and not self.invalid
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return "".join(self._chunks)
+
+    def value(self) -> Any:
+        """
+        Decode the complete value
+
+        Raises:
+            ValueError: If the value is not complete or not valid JSON
+        """
+        if not self.ready:
+            raise ValueError("JSON value is not complete")
+        return json.loads(self.text)
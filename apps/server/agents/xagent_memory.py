@@ -0,0 +1,595 @@
+"""
+Conversation memory support for the XAgent adapter
+
+Chat history is converted from the memory object (ZepMemory or any Langchain
+chat memory) into chat messages, and finished turns are persisted through a
+write-behind queue. A background worker drains the queue in batches, writing
+each session's pending turns in one call, so Zep round trips stay off the
+request path. Turns still queued are merged into loaded history, so the next
+turn sees them before they reach Zep.
+
+Loaded history is kept in a bounded in-process cache. Turns this worker
+writes are appended to it (write-through). Before a cached entry is served,
+the session's latest message is read from Zep (a one-message request
+instead of the whole history) and compared with the entry's last message,
+so turns written by other server workers are never missed. Backends that
+cannot report their latest message fall back to a short
+XAGENT_HISTORY_CACHE_TTL, within which another worker's writes may be
+missed.
+
+ZepMemory handles are cached per session and share one Zep client per
+server, so chat turns reuse warm keep-alive connections instead of setting
+up a new HTTP client (and TLS session) every message.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Write-behind batching: turns per batch and the longest wait for a batch to fill
+XAGENT_MEMORY_BATCH_SIZE = int(os.environ.get("XAGENT_MEMORY_BATCH_SIZE", "32"))
+XAGENT_MEMORY_FLUSH_INTERVAL = float(os.environ.get("XAGENT_MEMORY_FLUSH_INTERVAL", "0.5"))
+
+# Most recent history messages included in a prompt, and seconds to wait for them
+XAGENT_MEMORY_MAX_MESSAGES = int(os.environ.get("XAGENT_MEMORY_MAX_MESSAGES", "20"))
+XAGENT_MEMORY_LOAD_TIMEOUT = float(os.environ.get("XAGENT_MEMORY_LOAD_TIMEOUT", "5"))
+
+# History loads run on their own executor so they never queue behind LLM calls
+XAGENT_MEMORY_MAX_WORKERS = int(os.environ.get("XAGENT_MEMORY_MAX_WORKERS", "8"))
+
+# History cache: total size in bytes and seconds before an entry is re-read
+# (the TTL only matters for backends without a latest-message check)
+XAGENT_HISTORY_CACHE_MAX_BYTES = int(os.environ.get("XAGENT_HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+XAGENT_HISTORY_CACHE_TTL = float(os.environ.get("XAGENT_HISTORY_CACHE_TTL", "30"))
+
+# Cached ZepMemory handles and seconds a handle may sit idle before eviction
+XAGENT_MEMORY_CACHE_SIZE = int(os.environ.get("XAGENT_MEMORY_CACHE_SIZE", "1024"))
+XAGENT_MEMORY_IDLE_TTL = float(os.environ.get("XAGENT_MEMORY_IDLE_TTL", "900"))
+
+_ROLES = {"human": "user", "ai": "assistant", "system": "system", "function": "function"}
+
+logger = logging.getLogger(__name__)
+
+_memory_executor: Optional[ThreadPoolExecutor] = None
+_memory_executor_lock = threading.Lock()
+
+
+def get_memory_executor() -> ThreadPoolExecutor:
+    """Return the thread pool for blocking memory reads, creating it on first use"""
+    global _memory_executor
+    with _memory_executor_lock:
+        if _memory_executor is None:
+            _memory_executor = ThreadPoolExecutor(
+                max_workers=XAGENT_MEMORY_MAX_WORKERS,
+                thread_name_prefix="xagent-memory"
+            )
+        return _memory_executor
+
+
+def memory_session_key(memory) -> str:
+    """Identify the conversation a memory object belongs to"""
+    chat_memory = getattr(memory, "chat_memory", None)
+    session_id = getattr(chat_memory, "session_id", None) or getattr(memory, "session_id", None)
+    return str(session_id) if session_id is not None else f"memory-{id(memory)}"
+
+
+def history_to_messages(chat_history: Any, max_messages: int = XAGENT_MEMORY_MAX_MESSAGES) -> List[Dict]:
+    """
+    Convert memory variables to OpenAI-style chat messages
+
+    Args:
+        chat_history: Langchain messages (return_messages=True) or a
+            formatted history string
+        max_messages: Keep only this many of the most recent messages
+
+    Returns:
+        List of {"role", "content"} dicts
+    """
+    if not chat_history:
+        return []
+
+    if isinstance(chat_history, str):
+        return [{"role": "system", "content": f"Conversation so far:\n{chat_history}"}]
+
+    messages = []
+    for message in chat_history:
+        role = _ROLES.get(getattr(message, "type", ""), "user")
+        messages.append({"role": role, "content": str(getattr(message, "content", message))})
+    return messages[-max_messages:] if max_messages else messages
+
+
+def latest_message_content(memory) -> Optional[str]:
+    """
+    Content of the newest stored message of a Zep-backed memory
+
+    Returns:
+        The content, "" for an empty session, or None if the backend
+        cannot tell (not Zep, or the request failed)
+    """
+    chat_memory = getattr(memory, "chat_memory", None)
+    session_id = getattr(chat_memory, "session_id", None)
+    client = getattr(chat_memory, "zep_client", None)
+    get_memory = getattr(getattr(client, "memory", None), "get_memory", None)
+    if session_id is None or not callable(get_memory):
+        return None
+
+    try:
+        latest = get_memory(session_id, lastn=1)
+    except Exception as e:
+        logger.debug(f"Could not read the latest message of session {session_id}: {e}")
+        return None
+    messages = getattr(latest, "messages", None) or []
+    return str(getattr(messages[-1], "content", "")) if messages else ""
+
+
+def load_history(memory, max_messages: int = XAGENT_MEMORY_MAX_MESSAGES) -> List[Dict]:
+    """
+    Load a memory's chat history, including turns not yet written
+
+    Served from the history cache when it is still current. Blocking; the
+    adapter calls it on get_memory_executor().
+    """
+    key = memory_session_key(memory)
+    messages = memory_writer.cached_history(key, latest_message_content(memory))
+
+    if messages is None:
+        history_cache.begin_read(key)
+        try:
+            memory_key = getattr(memory, "memory_key", "chat_history")
+            variables = memory.load_memory_variables({})
+            loaded = history_to_messages(variables.get(memory_key), 0)
+        except BaseException:
+            history_cache.end_read(key, None)
+            raise
+        messages = memory_writer.store_history(key, loaded)
+
+    return messages[-max_messages:] if max_messages else messages
+
+
+class ChatHistoryCache:
+    """
+    Bounded per-session cache of loaded chat history with write-through
+
+    A read from the memory backend is only cached if no write for the same
+    session finished while it was in flight, since the backend may or may
+    not have included that write. Entries are validated against the
+    backend's latest message when the caller supplies it, and otherwise
+    expire after ttl seconds.
+    """
+
+    def __init__(self, max_bytes: int = XAGENT_HISTORY_CACHE_MAX_BYTES,
+                 ttl: float = XAGENT_HISTORY_CACHE_TTL):
+        """
+        Initialize the history cache
+
+        Args:
+            max_bytes: Approximate total size of cached message contents
+            ttl: Seconds after loading before an entry must be re-read, for
+                reads that cannot be validated against the backend
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._entries: "OrderedDict[str, Tuple[List[Dict], int, float]]" = OrderedDict()
+        self._reads: Dict[str, int] = {}
+        self._stale_reads = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, latest_content: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Cached history of a session, or None on a miss
+
+        Args:
+            key: Session key
+            latest_content: Content of the backend's newest message ("" if
+                the session is empty); the entry is only served if its last
+                message matches. None falls back to the TTL.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if latest_content is not None:
+                    cached_last = (entry[0][-1].get("content") or "") if entry[0] else ""
+                    current = cached_last == latest_content
+                else:
+                    current = time.monotonic() - entry[2] < self.ttl
+                if not current:
+                    # Another worker wrote to the session, or the entry expired
+                    self._remove(key)
+                    self.stale += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[0])
+
+    def begin_read(self, key: str):
+        """Mark a backend read of the session as in flight"""
+        with self._lock:
+            self._reads[key] = self._reads.get(key, 0) + 1
+
+    def end_read(self, key: str, messages: Optional[List[Dict]]):
+        """Finish a backend read, caching its result unless a write raced it"""
+        with self._lock:
+            self._reads[key] -= 1
+            stale = key in self._stale_reads
+            if not self._reads[key]:
+                del self._reads[key]
+                self._stale_reads.discard(key)
+            if messages is None or stale:
+                return
+
+            self._remove(key)
+            size = self._size_of(messages)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (list(messages), size, time.monotonic())
+            self.size += size
+            self._evict()
+
+    def append(self, key: str, messages: List[Dict]):
+        """Write-through: add messages persisted by this worker"""
+        with self._lock:
+            if key in self._reads:
+                self._stale_reads.add(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            cached, size, loaded_at = entry
+            cached.extend(messages)
+            added = self._size_of(messages)
+            self._entries[key] = (cached, size + added, loaded_at)
+            self._entries.move_to_end(key)
+            self.size += added
+            self._evict()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if key in self._reads:
+                self._stale_reads.add(key)
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self.size -= size
+
+    @staticmethod
+    def _size_of(messages: List[Dict]) -> int:
+        # Content length plus a rough per-message overhead
+        return sum(len(message.get("content") or "") + 64 for message in messages)
+
+
+# Process-wide chat history cache in front of the memory backend
+history_cache = ChatHistoryCache()
+
+
+# A queued turn: input, output, human name and AI name
+_Turn = Tuple[str, str, Optional[str], Optional[str]]
+
+
+def _turns_to_messages(turns: List[_Turn]) -> List[Dict]:
+    messages = []
+    for input_text, output_text, _, _ in turns:
+        messages.append({"role": "user", "content": input_text})
+        messages.append({"role": "assistant", "content": output_text})
+    return messages
+
+
+class XAgentMemoryWriter:
+    """
+    Write-behind queue that persists conversation turns in batches
+    """
+
+    def __init__(self, batch_size: int = XAGENT_MEMORY_BATCH_SIZE,
+                 flush_interval: float = XAGENT_MEMORY_FLUSH_INTERVAL):
+        """
+        Initialize the writer
+
+        Args:
+            batch_size: Maximum turns drained per batch
+            flush_interval: Seconds to wait for more turns before writing
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        self._queue: "queue.Queue[Tuple[str, Any, _Turn]]" = queue.Queue()
+        self._pending: Dict[str, List[_Turn]] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._unfinished = 0
+        self._worker: Optional[threading.Thread] = None
+
+    def save(self, memory, input_text: str, output_text: str, human_name: Optional[str] = None,
+             ai_name: Optional[str] = None, auto_save: bool = True):
+        """
+        Queue a turn for persistence and return immediately
+
+        Args:
+            memory: Memory handle of the session
+            input_text: The human message
+            output_text: The AI message
+            human_name: Speaker name stored with the human message
+            ai_name: Speaker name stored with the AI message
+            auto_save: Whether the turn is saved at all (False skips it, like
+                ZepMemory's auto_save)
+
+        The per-turn settings are passed here rather than read from the
+        handle, which is cached and shared by every turn of the session.
+        """
+        if memory is None or not auto_save:
+            return
+
+        key = memory_session_key(memory)
+        turn = (input_text, output_text, human_name, ai_name)
+        with self._lock:
+            self._pending.setdefault(key, []).append(turn)
+            self._unfinished += 1
+            self._ensure_worker()
+        self._queue.put((key, memory, turn))
+
+    def pending_messages(self, memory) -> List[Dict]:
+        """Queued turns of a memory's session as chat messages"""
+        with self._lock:
+            return self._pending_messages(memory_session_key(memory))
+
+    def cached_history(self, key: str, latest_content: Optional[str] = None) -> Optional[List[Dict]]:
+        """Cached history of a session plus its queued turns, or None on a miss"""
+        with self._lock:
+            messages = history_cache.get(key, latest_content)
+            if messages is not None:
+                messages.extend(self._pending_messages(key))
+            return messages
+
+    def store_history(self, key: str, loaded: List[Dict]) -> List[Dict]:
+        """Cache history read from the backend and return it plus queued turns"""
+        with self._lock:
+            history_cache.end_read(key, loaded)
+            return loaded + self._pending_messages(key)
+
+    def _pending_messages(self, key: str) -> List[Dict]:
+        return _turns_to_messages(self._pending.get(key, []))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued turn has been written
+
+        Returns:
+            False if the timeout expired first
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._idle:
+            while self._unfinished:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run,
+                name="xagent-memory-writer",
+                daemon=True
+            )
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Tuple[str, Any, _Turn]]):
+        # Group by session, keeping turn order within each session
+        sessions: "OrderedDict[str, Tuple[Any, List[_Turn]]]" = OrderedDict()
+        for key, memory, turn in batch:
+            sessions.setdefault(key, (memory, []))[1].append(turn)
+
+        for key, (memory, turns) in sessions.items():
+            written = False
+            try:
+                self._write_turns(memory, turns)
+                self.written += len(turns)
+                written = True
+            except Exception as e:
+                self.failed += len(turns)
+                logger.warning(f"Failed to persist {len(turns)} turn(s) for session {key}: {e}")
+            finally:
+                with self._idle:
+                    # Moved from pending to the cache atomically for readers
+                    if written:
+                        history_cache.append(key, _turns_to_messages(turns))
+                    else:
+                        history_cache.invalidate(key)
+                    pending = self._pending.get(key, [])
+                    del pending[:len(turns)]
+                    if not pending:
+                        self._pending.pop(key, None)
+                    self._unfinished -= len(turns)
+                    self._idle.notify_all()
+
+    @staticmethod
+    def _write_turns(memory, turns: List[_Turn]):
+        """
+        Write turns in one call when the chat history supports it
+
+        Messages carry the speaker names the way ZepMemory stores them.
+        """
+        chat_memory = getattr(memory, "chat_memory", None)
+        if chat_memory is not None and hasattr(chat_memory, "add_messages"):
+            from langchain.schema import AIMessage, HumanMessage
+
+            messages = []
+            for input_text, output_text, human_name, ai_name in turns:
+                messages.append(HumanMessage(content=input_text, additional_kwargs=_speaker(human_name)))
+                messages.append(AIMessage(content=output_text, additional_kwargs=_speaker(ai_name)))
+            chat_memory.add_messages(messages)
+            return
+
+        for input_text, output_text, human_name, ai_name in turns:
+            # save_context reads the names from the handle; turns are only
+            # written from this worker, so setting them here does not race
+            if human_name is not None:
+                memory.human_name = human_name
+            if ai_name is not None:
+                memory.ai_name = ai_name
+            memory.save_context({"input": input_text}, {"output": output_text})
+
+
+def _speaker(name: Optional[str]) -> Dict[str, str]:
+    return {"name": name} if name else {}
+
+
+# Process-wide write-behind queue shared by every adapter
+memory_writer = XAgentMemoryWriter()
+atexit.register(memory_writer.flush, XAGENT_MEMORY_FLUSH_INTERVAL * 4)
+
+
+class ZepMemoryCache:
+    """
+    Per-session memory handles sharing one pooled Zep client per server
+    """
+
+    def __init__(self, max_size: int = XAGENT_MEMORY_CACHE_SIZE, idle_ttl: float = XAGENT_MEMORY_IDLE_TTL):
+        """
+        Initialize the handle cache
+
+        Args:
+            max_size: Maximum cached handles (least recently used evicted first)
+            idle_ttl: Seconds a handle may go unused before it is evicted
+        """
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.hits = 0
+        self.misses = 0
+        self._handles: "OrderedDict[tuple, Tuple[Any, float]]" = OrderedDict()
+        self._clients: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id, factory: Callable[..., Any], url: str, api_key: Optional[str],
+            memory_key: str = "chat_history", **kwargs):
+        """
+        Return the session's memory handle, creating it on first use
+
+        Args:
+            session_id: Chat or simulation session
+            factory: Memory class, e.g. ZepMemory
+            url: Zep server URL
+            api_key: Zep API key
+            memory_key: Memory variable holding the history
+            **kwargs: Further factory arguments (e.g. return_messages)
+
+        Returns:
+            Memory handle shared by every turn of the session; per-turn
+            settings (speaker names, auto_save) are passed to the adapter
+            or memory_writer instead of being set on it
+        """
+        key = (str(session_id), url, api_key, memory_key)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._handles.pop(key, None)
+            if entry is not None:
+                self._handles[key] = (entry[0], now)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        memory = factory(session_id=str(session_id), url=url, api_key=api_key,
+                         memory_key=memory_key, **kwargs)
+
+        with self._lock:
+            replaced = self._share_client(memory, (url, api_key))
+            self._handles[key] = (memory, now)
+            while len(self._handles) > self.max_size:
+                self._handles.popitem(last=False)
+
+        if replaced is not None:
+            _close_client(replaced)
+        return memory
+
+    def clear(self):
+        """Drop every handle and close the pooled clients (e.g. at shutdown)"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._handles.clear()
+            self._clients.clear()
+        for client in clients:
+            _close_client(client)
+
+    def __len__(self):
+        return len(self._handles)
+
+    def _share_client(self, memory, server: tuple):
+        """
+        Point the handle at the server's pooled client (the first one created)
+
+        Returns:
+            The handle's own client if it was replaced, for the caller to close
+        """
+        chat_memory = getattr(memory, "chat_memory", None)
+        client = getattr(chat_memory, "zep_client", None)
+        if client is None:
+            return None
+
+        shared = self._clients.setdefault(server, client)
+        if shared is client:
+            return None
+        chat_memory.zep_client = shared
+        return client
+
+    def _evict_idle(self, now: float):
+        # Handles are kept in last-used order, so idle ones are at the front
+        while self._handles:
+            key, (memory, last_used) = next(iter(self._handles.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            self._handles.popitem(last=False)
+
+
+def _close_client(client):
+    """Release a Zep client's HTTP connections"""
+    close = getattr(client, "close", None)
+    if not callable(close):
+        return
+    try:
+        close()
+    except Exception as e:
+        logger.warning(f"Failed to close Zep client: {e}")
+
+
+# Process-wide ZepMemory handle cache
+zep_memory_cache = ZepMemoryCache()
@@ -0,0 +1,238 @@
+"""
+Token usage accounting for the XAgent adapter
+
+Every LLM call made by an adapter is recorded with its token counts, model
+and duration, and aggregated per session, agent, account and model. The
+process-wide usage_metrics object is the in-process metrics API.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+# Bounds on the per-session aggregates and the recent call log
+XAGENT_METRICS_MAX_SESSIONS = int(os.environ.get("XAGENT_METRICS_MAX_SESSIONS", "10000"))
+XAGENT_METRICS_RECENT_CALLS = int(os.environ.get("XAGENT_METRICS_RECENT_CALLS", "1000"))
+
+
+def normalize_usage(tokens: Any) -> Dict[str, int]:
+    """
+    Normalize token usage from ToolAgent.parse, OpenAI or a custom backend
+
+    Accepts a usage dict, an object with usage attributes or a bare total.
+    """
+    if tokens is None:
+        tokens = {}
+    elif isinstance(tokens, (int, float)):
+        tokens = {"total_tokens": tokens}
+    elif not isinstance(tokens, dict):
+        tokens = {
+            name: getattr(tokens, name, 0)
+            for name in ("prompt_tokens", "completion_tokens", "total_tokens")
+        }
+
+    prompt_tokens = int(tokens.get("prompt_tokens") or 0)
+    completion_tokens = int(tokens.get("completion_tokens") or 0)
+    total_tokens = int(tokens.get("total_tokens") or prompt_tokens + completion_tokens)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": total_tokens,
+    }
+
+
+class TokenUsage:
+    """
+    Aggregated token counts and timing for a set of LLM calls
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.duration_seconds = 0.0
+        self.model: Optional[str] = None
+
+    def add(self, usage: Dict[str, int], duration: float = 0.0, model: Optional[str] = None):
+        """Add one call's normalized usage"""
+        self.calls += 1
+        self.prompt_tokens += usage["prompt_tokens"]
+        self.completion_tokens += usage["completion_tokens"]
+        self.total_tokens += usage["total_tokens"]
+        self.duration_seconds += duration
+        if model:
+            self.model = model
+
+    def token_usage(self) -> Dict[str, int]:
+        """Token counts in OpenAI usage format"""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(
+            self.token_usage(),
+            calls=self.calls,
+            duration_seconds=self.duration_seconds,
+            model=self.model,
+        )
+
+
+class XAgentUsageMetrics:
+    """
+    Thread-safe in-process registry of LLM token usage
+    """
+
+    def __init__(self, max_sessions: int = XAGENT_METRICS_MAX_SESSIONS,
+                 max_recent_calls: int = XAGENT_METRICS_RECENT_CALLS):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=max_recent_calls)
+        self.reset()
+
+    def record(self, tokens: Any, duration: float = 0.0, model: Optional[str] = None,
+               session_id: Optional[str] = None, agent_id: Optional[str] = None,
+               account_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Record a single LLM call
+
+        Args:
+            tokens: Usage as returned by the LLM call
+            duration: Seconds the call took
+            model: Model name
+            session_id: Chat or simulation session
+            agent_id: L3AGI agent
+            account_id: L3AGI account
+
+        Returns:
+            The normalized call record
+        """
+        usage = normalize_usage(tokens)
+        record = dict(
+            usage,
+            model=model,
+            duration_seconds=duration,
+            session_id=session_id,
+            agent_id=agent_id,
+            account_id=account_id,
+            timestamp=time.time(),
+        )
+
+        with self._lock:
+            self._totals.add(usage, duration, model)
+            self._recent.append(record)
+
+            for registry, key in (
+                (self._agents, agent_id),
+                (self._accounts, account_id),
+                (self._models, model),
+            ):
+                if key is not None:
+                    registry.setdefault(str(key), TokenUsage()).add(usage, duration, model)
+
+            if session_id is not None:
+                session_id = str(session_id)
+                if session_id not in self._sessions:
+                    self._sessions[session_id] = TokenUsage()
+                self._sessions.move_to_end(session_id)
+                self._sessions[session_id].add(usage, duration, model)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+        return record
+
+    def session_usage(self, session_id) -> Optional[Dict[str, Any]]:
+        return self._get(self._sessions, session_id)
+
+    def agent_usage(self, agent_id) -> Optional[Dict[str, Any]]:
+        return self._get(self._agents, agent_id)
+
+    def account_usage(self, account_id) -> Optional[Dict[str, Any]]:
+        return self._get(self._accounts, account_id)
+
+    def model_usage(self, model: str) -> Optional[Dict[str, Any]]:
+        return self._get(self._models, model)
+
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._totals.as_dict()
+
+    def recent_calls(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recent call records, oldest first"""
+        with self._lock:
+            calls = list(self._recent)
+        return calls[-limit:] if limit else calls
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All aggregates as plain dicts"""
+        with self._lock:
+            return {
+                "totals": self._totals.as_dict(),
+                "agents": {key: usage.as_dict() for key, usage in self._agents.items()},
+                "accounts": {key: usage.as_dict() for key, usage in self._accounts.items()},
+                "models": {key: usage.as_dict() for key, usage in self._models.items()},
+                "sessions": len(self._sessions),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._totals = TokenUsage()
+            self._sessions: "OrderedDict[str, TokenUsage]" = OrderedDict()
+            self._agents: Dict[str, TokenUsage] = {}
+            self._accounts: Dict[str, TokenUsage] = {}
+            self._models: Dict[str, TokenUsage] = {}
+            self._recent.clear()
+
+    def _get(self, registry: Dict[str, TokenUsage], key) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            usage = registry.get(str(key))
+            return usage.as_dict() if usage else None
+
+
+# Process-wide usage registry fed by every adapter
+usage_metrics = XAgentUsageMetrics()
+
+
+def log_usage_to_run_logs(run_logs_manager, usage: TokenUsage, output: str = ""):
+    """
+    Attach a turn's token usage to the run log
+
+    Reported through the run log's agent callback handler as a Langchain
+    LLM end event, the same channel Langchain agents used for token counts.
+    Failures are logged and never fail the turn.
+    """
+    if not usage.calls:
+        return
+
+    try:
+        from langchain.schema import Generation, LLMResult
+
+        handler = run_logs_manager.get_agent_callback_handler()
+        result = handler.on_llm_end(
+            LLMResult(
+                generations=[[Generation(text=output)]],
+                llm_output={
+                    "token_usage": usage.token_usage(),
+                    "model_name": usage.model,
+                    "duration_seconds": usage.duration_seconds,
+                },
+            ),
+            run_id=uuid4(),
+        )
+
+        if inspect.isawaitable(result):
+            try:
+                asyncio.get_running_loop().create_task(result)
+            except RuntimeError:
+                asyncio.run(result)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Failed to log token usage to run logs: {e}")
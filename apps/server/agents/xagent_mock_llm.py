@@ -0,0 +1,179 @@
+"""
+Offline stand-in LLM for the XAgent adapter
+
+MockLLMBackend implements the adapter's llm_backend interface without any
+network access or XAgent installation. Responses are scripted (or echo the
+last user message), latency is configurable per response and per streamed
+chunk, and function calls are returned or streamed the way OpenAI does.
+It also implements acomplete_batch, standing in for a batch-capable backend
+behind MicroBatcher.
+"""
+
+import asyncio
+import itertools
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+ScriptedResponse = Union[str, Dict[str, Any]]
+
+
+class MockLLMBackend:
+    """
+    Scripted local LLM backend for tests and benchmarks
+    """
+
+    def __init__(
+        self,
+        responses: Optional[List[ScriptedResponse]] = None,
+        responder: Optional[Callable[[List[Dict], List[Dict]], ScriptedResponse]] = None,
+        latency: float = 0.0,
+        chunk_latency: float = 0.0,
+        argument_chunk_size: int = 8,
+        model: str = "mock-llm",
+    ):
+        """
+        Initialize the mock backend
+
+        Args:
+            responses: Responses returned in order (cycled). A string is a
+                content reply; a dict is returned as-is, e.g.
+                {"function_call": {"name": ..., "arguments": "{...}"}}
+            responder: Callable (messages, functions) -> response used when
+                no scripted responses are given; defaults to echoing the
+                last user message
+            latency: Seconds before a response (or the first streamed chunk)
+            chunk_latency: Seconds between streamed chunks
+            argument_chunk_size: Characters per streamed function call
+                argument delta
+            model: Model name reported in usage
+        """
+        self._responses = itertools.cycle(responses) if responses else None
+        self.responder = responder or self._echo
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.argument_chunk_size = argument_chunk_size
+        self.model = model
+        self.calls = 0
+        self.batch_calls = 0
+
+    async def acomplete(self, request: Dict, functions: List[Dict]) -> Tuple[Dict, Dict]:
+        """
+        Return a complete response, shaped like ToolAgent.parse output
+
+        Args:
+            request: Completion kwargs including "messages"
+            functions: Function schemas available to the model
+
+        Returns:
+            Tuple of (response dict, usage dict)
+        """
+        response = self._next_response(request, functions)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return response, self._usage(request, response)
+
+    async def acomplete_batch(self, requests: List[Dict], functions: List[Dict]) -> List[Tuple[Dict, Dict]]:
+        """
+        Return complete responses for several requests after a single latency
+
+        Args:
+            requests: Completion kwargs including "messages", one per request
+            functions: Function schemas available to the model
+
+        Returns:
+            (response dict, usage dict) per request, in request order, or
+            the exception raised for that request
+        """
+        self.batch_calls += 1
+        results = []
+        for request in requests:
+            # A failing request fails alone, as in a real batch response
+            try:
+                response = self._next_response(request, functions)
+                results.append((response, self._usage(request, response)))
+            except Exception as e:
+                results.append(e)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return results
+
+    async def astream(self, request: Dict, functions: List[Dict]):
+        """
+        Stream a response as OpenAI-style deltas
+
+        Args:
+            request: Completion kwargs including "messages"
+            functions: Function schemas available to the model
+
+        Yields:
+            Delta dicts with "content" and/or partial "function_call", then
+            a final "usage" delta
+        """
+        response = self._next_response(request, functions)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        first = True
+        for delta in self._deltas(response):
+            if not first and self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            first = False
+            yield delta
+
+        yield {"usage": self._usage(request, response)}
+
+    def _next_response(self, request: Dict, functions: List[Dict]) -> Dict:
+        self.calls += 1
+        if self._responses is not None:
+            response = next(self._responses)
+        else:
+            response = self.responder(request.get("messages", []), functions)
+
+        if isinstance(response, str):
+            return {"role": "assistant", "content": response}
+        return dict(response)
+
+    def _deltas(self, response: Dict):
+        """Split a response into content and function call deltas"""
+        if response.get("content"):
+            # Word-sized chunks that keep their trailing whitespace
+            for piece in re.findall(r"\S+\s*|\s+", response["content"]):
+                yield {"content": piece}
+
+        function_call = response.get("function_call")
+        if function_call:
+            arguments = function_call.get("arguments", "")
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments)
+
+            yield {"function_call": {"name": function_call.get("name"), "arguments": ""}}
+            for start in range(0, len(arguments), self.argument_chunk_size):
+                yield {"function_call": {
+                    "name": None,
+                    "arguments": arguments[start:start + self.argument_chunk_size]
+                }}
+
+    def _usage(self, request: Dict, response: Dict) -> Dict:
+        """Approximate token usage by whitespace-separated words"""
+        prompt_tokens = sum(
+            len(str(message.get("content") or "").split())
+            for message in request.get("messages", [])
+        )
+        completion_tokens = len(str(response.get("content") or "").split())
+        if response.get("function_call"):
+            completion_tokens += len(json.dumps(response["function_call"]).split())
+
+        return {
+            "model": self.model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    @staticmethod
+    def _echo(messages: List[Dict], functions: List[Dict]) -> str:
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                return f"Echo: {message.get('content', '')}"
+        return "Echo:"
@@ -0,0 +1,210 @@
+"""
+Asynchronous persistence and publishing of AI chat messages
+
+ConversationalAgent.run hands the final AI message to message_dispatcher and
+returns. Two pipelined worker threads finish the turn: the first drains
+queued messages in batches and stores them (history.create_ai_message), the
+second publishes stored messages to pubsub. Each stage is a single FIFO
+worker, so messages are stored and delivered in submission order, which
+keeps every session's messages ordered. While one batch is being published
+the next one is already being stored. Each message's spans are parented to
+the span that submitted it, so they stay part of the request's trace.
+Failed stores are retried with exponential backoff.
+"""
+
+import asyncio
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from agents.xagent_tracing import tracer
+
+# Queued messages before submit() waits for room, and messages stored per batch
+XAGENT_PERSIST_QUEUE_SIZE = int(os.environ.get("XAGENT_PERSIST_QUEUE_SIZE", "1000"))
+XAGENT_PERSIST_BATCH_SIZE = int(os.environ.get("XAGENT_PERSIST_BATCH_SIZE", "50"))
+
+# Store retries per message and the base backoff in seconds
+XAGENT_PERSIST_MAX_RETRIES = int(os.environ.get("XAGENT_PERSIST_MAX_RETRIES", "3"))
+XAGENT_PERSIST_RETRY_BACKOFF = float(os.environ.get("XAGENT_PERSIST_RETRY_BACKOFF", "0.5"))
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingMessage:
+    """An AI message on its way through the pipeline"""
+
+    def __init__(self, history, pubsub, content, human_message_id, agent_id, voice_url):
+        self.history = history
+        self.pubsub = pubsub
+        self.content = content
+        self.human_message_id = human_message_id
+        self.agent_id = agent_id
+        self.voice_url = voice_url
+        self.ai_message = None
+        # Tracing context of the submitter, so worker spans join its trace
+        self.context = contextvars.copy_context()
+
+
+class XAgentMessageDispatcher:
+    """
+    Bounded, batched store-then-publish pipeline for AI messages
+    """
+
+    def __init__(self, max_queue: int = XAGENT_PERSIST_QUEUE_SIZE,
+                 batch_size: int = XAGENT_PERSIST_BATCH_SIZE,
+                 max_retries: int = XAGENT_PERSIST_MAX_RETRIES,
+                 retry_backoff: float = XAGENT_PERSIST_RETRY_BACKOFF):
+        """
+        Initialize the dispatcher
+
+        Args:
+            max_queue: Messages waiting to be stored before submit() waits
+                for room (backpressure instead of unbounded memory)
+            batch_size: Maximum messages stored per batch
+            max_retries: Store retries per message after a failure
+            retry_backoff: Base delay in seconds, doubled on every retry
+        """
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.stored = 0
+        self.published = 0
+        self.failed = 0
+        self._store_queue: "queue.Queue[_PendingMessage]" = queue.Queue(maxsize=max_queue)
+        self._publish_queue: "queue.Queue[List[_PendingMessage]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._unfinished = 0
+        self._workers: List[threading.Thread] = []
+
+    async def submit(self, history, chat_pubsub_service, content: str, human_message_id,
+                     agent_id, voice_url: Optional[str] = None):
+        """
+        Queue an AI message to be stored and published
+
+        Returns as soon as the message is queued; only waits if the queue
+        is full.
+
+        Args:
+            history: PostgresChatMessageHistory of the session
+            chat_pubsub_service: ChatPubSubService the message is published to
+            content: AI message text
+            human_message_id: Id of the human message being answered
+            agent_id: Responding agent
+            voice_url: Synthesized speech, if any
+        """
+        message = _PendingMessage(history, chat_pubsub_service, content, human_message_id,
+                                  agent_id, voice_url)
+        with self._lock:
+            self._unfinished += 1
+            self._ensure_workers()
+
+        try:
+            self._store_queue.put_nowait(message)
+        except queue.Full:
+            logger.warning("AI message queue is full, waiting for room")
+            await asyncio.get_running_loop().run_in_executor(None, self._store_queue.put, message)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every submitted message has been stored and published
+
+        Returns:
+            False if the timeout expired first
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._idle:
+            while self._unfinished:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _ensure_workers(self):
+        if self._workers and all(worker.is_alive() for worker in self._workers):
+            return
+        self._workers = [
+            threading.Thread(target=target, name=name, daemon=True)
+            for target, name in (
+                (self._run_store, "xagent-message-store"),
+                (self._run_publish, "xagent-message-publish"),
+            )
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _run_store(self):
+        while True:
+            batch = [self._store_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._store_queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._store(batch)
+            self._publish_queue.put(batch)
+
+    def _run_publish(self):
+        while True:
+            self._publish(self._publish_queue.get())
+
+    def _store(self, batch: List[_PendingMessage]):
+        for message in batch:
+            message.context.run(self._store_one, message, len(batch))
+
+    def _store_one(self, message: _PendingMessage, batch_size: int):
+        with tracer.span("history.create_ai_message", batch_size=batch_size) as span:
+            attempt = 0
+            while True:
+                try:
+                    message.ai_message = message.history.create_ai_message(
+                        message.content,
+                        message.human_message_id,
+                        message.agent_id,
+                        message.voice_url,
+                    )
+                    self.stored += 1
+                    return
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        self.failed += 1
+                        span.record_exception(e)
+                        logger.error(
+                            f"Failed to store AI message for agent {message.agent_id} "
+                            f"after {attempt + 1} attempt(s): {e}"
+                        )
+                        return
+                    attempt += 1
+                    span.set_attribute("retries", attempt)
+                    time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+
+    def _publish(self, batch: List[_PendingMessage]):
+        for message in batch:
+            message.context.run(self._publish_one, message, len(batch))
+
+        with self._idle:
+            self._unfinished -= len(batch)
+            self._idle.notify_all()
+
+    def _publish_one(self, message: _PendingMessage, batch_size: int):
+        if message.ai_message is None:
+            return
+        with tracer.span("pubsub.send_chat_message", batch_size=batch_size) as span:
+            try:
+                message.pubsub.send_chat_message(chat_message=message.ai_message)
+                self.published += 1
+            except Exception as e:
+                self.failed += 1
+                span.record_exception(e)
+                logger.error(f"Failed to publish AI message: {e}")
+
+
+# Process-wide AI message pipeline
+message_dispatcher = XAgentMessageDispatcher()
+atexit.register(message_dispatcher.flush, 10)
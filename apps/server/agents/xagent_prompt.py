@@ -0,0 +1,170 @@
+"""
+Cached system prompts and incremental prompt assembly
+
+Agent system prompts only change when the agent's configuration is edited,
+so SystemPromptCache builds each one once per configuration version. The
+adapter's PromptAssembler keeps the system prefix messages built once per
+system prompt and only appends the per-turn messages, so every request
+starts with a byte-identical prefix that provider-side prompt caching can
+reuse.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# Number of built system prompts kept in memory
+XAGENT_SYSTEM_PROMPT_CACHE_SIZE = int(os.environ.get("XAGENT_SYSTEM_PROMPT_CACHE_SIZE", "512"))
+
+
+def _digest(value: Any) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def config_version(agent_with_configs) -> str:
+    """
+    Version of an agent's configuration
+
+    Hash of the agent and its configs, so any edit yields a new version.
+    """
+    for name in ("model_dump", "dict"):
+        dump = getattr(agent_with_configs, name, None)
+        if callable(dump):
+            return _digest(dump())
+    return _digest(vars(agent_with_configs) if hasattr(agent_with_configs, "__dict__") else agent_with_configs)
+
+
+class SystemPromptCache:
+    """
+    LRU of built system prompts keyed by agent, config version and context
+    """
+
+    def __init__(self, max_entries: int = XAGENT_SYSTEM_PROMPT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, agent_with_configs, pre_retrieved_context: str,
+            builder: Callable[..., Any]) -> str:
+        """
+        Return the system prompt, building it only for a new config version
+
+        Args:
+            agent_with_configs: Agent and its configs
+            pre_retrieved_context: Context retrieved for this turn
+            builder: Builder class called as builder(agent_with_configs,
+                pre_retrieved_context).build(), e.g. SystemMessageBuilder
+
+        Returns:
+            The system prompt text
+        """
+        agent_id = str(getattr(getattr(agent_with_configs, "agent", None), "id", ""))
+        key = (
+            agent_id,
+            config_version(agent_with_configs),
+            _digest(pre_retrieved_context or ""),
+        )
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        system_message = builder(agent_with_configs, pre_retrieved_context).build()
+
+        with self._lock:
+            self._entries[key] = system_message
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return system_message
+
+    def invalidate(self, agent_id=None):
+        """Drop cached prompts for one agent, or all of them"""
+        with self._lock:
+            if agent_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == str(agent_id)]:
+                del self._entries[key]
+
+
+# Process-wide system prompt cache
+system_prompt_cache = SystemPromptCache()
+
+
+class PromptAssembler:
+    """
+    Keeps the system prefix messages and appends per-turn messages to them
+    """
+
+    def __init__(self, system_message: str = ""):
+        self.system_message = None
+        self._version: Optional[str] = None
+        self._prefix: List[Dict] = []
+        self._xagent_prefix: Optional[List[Any]] = None
+        self.set_system_message(system_message)
+
+    @property
+    def version(self) -> str:
+        """Short hash of the current system prompt"""
+        if self._version is None:
+            self._version = _digest(self.system_message)
+        return self._version
+
+    def set_system_message(self, system_message: str) -> bool:
+        """
+        Replace the system prompt
+
+        Returns:
+            True if the prompt changed and the prefix was rebuilt
+        """
+        system_message = system_message or ""
+        if system_message == self.system_message:
+            return False
+
+        self.system_message = system_message
+        self._version = None
+        self._prefix = [{"role": "system", "content": system_message}] if system_message else []
+        self._xagent_prefix = None
+        return True
+
+    def chat_messages(self, prompt: Optional[str] = None,
+                      additional_messages: Optional[List[Dict]] = None,
+                      history: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        OpenAI-style messages: the cached prefix, then the turn's messages
+
+        Args:
+            prompt: User prompt appended after the prefix (and history), if given
+            additional_messages: Messages appended after the prompt
+            history: Earlier conversation placed between prefix and prompt
+
+        Returns:
+            A new list the caller may extend
+        """
+        messages = list(self._prefix)
+        if history:
+            messages.extend(history)
+        if prompt is not None:
+            messages.append({"role": "user", "content": prompt})
+        if additional_messages:
+            messages.extend(additional_messages)
+        return messages
+
+    def xagent_messages(self, message_cls) -> List[Any]:
+        """The prefix as XAgent Message objects, built once per system prompt"""
+        if self._xagent_prefix is None:
+            self._xagent_prefix = [
+                message_cls(role=message["role"], content=message["content"])
+                for message in self._prefix
+            ]
+        return list(self._xagent_prefix)
@@ -0,0 +1,298 @@
+"""
+Shared LLM request scheduler for the XAgent adapter
+
+Every adapter LLM call passes through llm_scheduler before it reaches the
+provider. Per model, requests and tokens per minute are limited with token
+buckets; waiting calls are admitted by priority class (interactive chat
+before simulations before evaluations) and then arrival order. Rate-limit
+errors are retried with jittered exponential backoff, pause the whole model
+for the backoff period and halve its admitted rate, which then recovers
+gradually on success. Queue depth, waits and rate-limit counts are exposed
+through metrics().
+
+Limits come from XAGENT_DEFAULT_RPM / XAGENT_DEFAULT_TPM (0 means unlimited)
+and per-model overrides in XAGENT_MODEL_RATE_LIMITS, e.g.
+{"gpt-4": {"requests_per_minute": 500, "tokens_per_minute": 30000}}.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Priority classes; lower values are admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SIMULATION = 1
+PRIORITY_BATCH = 2
+
+XAGENT_DEFAULT_RPM = float(os.environ.get("XAGENT_DEFAULT_RPM", "0"))
+XAGENT_DEFAULT_TPM = float(os.environ.get("XAGENT_DEFAULT_TPM", "0"))
+XAGENT_MODEL_RATE_LIMITS = json.loads(os.environ.get("XAGENT_MODEL_RATE_LIMITS", "{}"))
+
+# Retries after a rate-limit error and the base backoff in seconds
+XAGENT_SCHEDULER_MAX_RETRIES = int(os.environ.get("XAGENT_SCHEDULER_MAX_RETRIES", "3"))
+XAGENT_SCHEDULER_BACKOFF = float(os.environ.get("XAGENT_SCHEDULER_BACKOFF", "1.0"))
+
+RATE_LIMIT_MARKERS = ("rate limit", "ratelimit", "429", "too many requests")
+
+# Bounds of the adaptive rate scale applied after rate-limit errors
+_MIN_RATE_SCALE = 0.1
+_RATE_RECOVERY = 1.05
+
+
+def is_rate_limited(error: Any) -> bool:
+    """Whether an exception or error string is a provider rate-limit error"""
+    if isinstance(error, BaseException):
+        if "ratelimit" in type(error).__name__.lower():
+            return True
+        if getattr(error, "status_code", None) == 429:
+            return True
+    text = str(error).lower()
+    return any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+class _TokenBucket:
+    """Continuously refilled bucket holding up to one minute of capacity"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def delay(self, amount: float, scale: float, now: float) -> float:
+        """Seconds until amount is available (0 if it is now)"""
+        if not self.per_minute:
+            return 0.0
+        rate = self.per_minute * scale / 60.0
+        self.level = min(self.per_minute, self.level + (now - self.updated) * rate)
+        self.updated = now
+        # Requests larger than the whole bucket wait for a full bucket
+        amount = min(amount, self.per_minute)
+        return max(0.0, (amount - self.level) / rate)
+
+    def consume(self, amount: float):
+        if self.per_minute:
+            self.level -= amount
+
+
+class _Waiter:
+    def __init__(self, priority: int, sequence: int, tokens: int, loop):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.loop = loop
+        self.future = None
+
+    def __lt__(self, other: "_Waiter"):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+    def wake(self):
+        future = self.future
+        if future is not None:
+            self.loop.call_soon_threadsafe(_resolve, future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _ModelState:
+    """Buckets, waiters and counters of one model"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = _TokenBucket(requests_per_minute)
+        self.tokens = _TokenBucket(tokens_per_minute)
+        self.rate_scale = 1.0
+        self.paused_until = 0.0
+        self.waiters: List[_Waiter] = []
+        self.admitted = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def delay(self, tokens: int, now: float) -> float:
+        return max(
+            self.paused_until - now,
+            self.requests.delay(1, self.rate_scale, now),
+            self.tokens.delay(tokens, self.rate_scale, now),
+        )
+
+
+class LLMScheduler:
+    """
+    Process-wide admission control for LLM calls
+    """
+
+    def __init__(self, default_rpm: float = XAGENT_DEFAULT_RPM, default_tpm: float = XAGENT_DEFAULT_TPM,
+                 model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 max_retries: int = XAGENT_SCHEDULER_MAX_RETRIES,
+                 backoff: float = XAGENT_SCHEDULER_BACKOFF):
+        """
+        Initialize the scheduler
+
+        Args:
+            default_rpm: Requests per minute for models without an override
+            default_tpm: Tokens per minute for models without an override
+            model_limits: Per-model {"requests_per_minute", "tokens_per_minute"}
+            max_retries: Retries of a call after rate-limit errors
+            backoff: Base delay in seconds for jittered exponential backoff
+        """
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.model_limits = dict(XAGENT_MODEL_RATE_LIMITS if model_limits is None else model_limits)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._models: Dict[str, _ModelState] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    async def run(self, model: str, make_call: Callable[[], Awaitable[Any]],
+                  estimated_tokens: int = 0, priority: int = PRIORITY_INTERACTIVE) -> Any:
+        """
+        Admit, run and (on rate-limit errors) retry an LLM call
+
+        Args:
+            model: Model name the limits apply to
+            make_call: Creates the awaitable call; invoked once per attempt
+            estimated_tokens: Expected prompt plus completion tokens
+            priority: One of the PRIORITY_* classes
+
+        Returns:
+            The call's result
+        """
+        attempt = 0
+        while True:
+            await self.acquire(model, estimated_tokens, priority)
+            try:
+                result = await make_call()
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay = self.report_rate_limited(model, attempt)
+                await asyncio.sleep(delay)
+                continue
+
+            self.report_success(model)
+            return result
+
+    async def acquire(self, model: str, estimated_tokens: int = 0,
+                      priority: int = PRIORITY_INTERACTIVE):
+        """Wait until the model's limits and higher-priority waiters admit a call"""
+        state = self._state(model)
+        started = time.monotonic()
+
+        with self._lock:
+            if not state.waiters and state.delay(estimated_tokens, started) <= 0:
+                self._admit(state, estimated_tokens, started)
+                return
+            waiter = _Waiter(priority, next(self._sequence), estimated_tokens,
+                             asyncio.get_running_loop())
+            heapq.heappush(state.waiters, waiter)
+
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    delay = None
+                    if state.waiters[0] is waiter:
+                        delay = state.delay(estimated_tokens, now)
+                        if delay <= 0:
+                            heapq.heappop(state.waiters)
+                            self._admit(state, estimated_tokens, started)
+                            if state.waiters:
+                                state.waiters[0].wake()
+                            return
+                    waiter.future = waiter.loop.create_future()
+                await asyncio.wait({waiter.future}, timeout=delay)
+        except BaseException:
+            with self._lock:
+                if waiter in state.waiters:
+                    was_head = state.waiters[0] is waiter
+                    state.waiters.remove(waiter)
+                    heapq.heapify(state.waiters)
+                    if was_head and state.waiters:
+                        state.waiters[0].wake()
+            raise
+
+    def settle(self, model: str, estimated_tokens: int, actual_tokens: int):
+        """Charge the difference between a call's estimated and actual tokens"""
+        state = self._state(model)
+        with self._lock:
+            state.tokens.consume(actual_tokens - estimated_tokens)
+
+    def report_rate_limited(self, model: str, attempt: int = 1) -> float:
+        """
+        Back off after a rate-limit error
+
+        Pauses the model, halves its admitted rate and returns the jittered
+        delay the caller should wait before retrying.
+        """
+        delay = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+        state = self._state(model)
+        with self._lock:
+            state.rate_limited += 1
+            state.retries += 1
+            state.rate_scale = max(_MIN_RATE_SCALE, state.rate_scale / 2)
+            state.paused_until = max(state.paused_until, time.monotonic() + delay)
+        return delay
+
+    def report_success(self, model: str):
+        state = self._state(model)
+        if state.rate_scale < 1.0:
+            with self._lock:
+                state.rate_scale = min(1.0, state.rate_scale * _RATE_RECOVERY)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth (total and per priority) and counters per model"""
+        with self._lock:
+            report = {}
+            for model, state in self._models.items():
+                depth: Dict[int, int] = {}
+                for waiter in state.waiters:
+                    depth[waiter.priority] = depth.get(waiter.priority, 0) + 1
+                report[model] = {
+                    "queue_depth": len(state.waiters),
+                    "queue_depth_by_priority": depth,
+                    "admitted": state.admitted,
+                    "rate_limited": state.rate_limited,
+                    "retries": state.retries,
+                    "rate_scale": state.rate_scale,
+                    "mean_wait_seconds": state.wait_seconds / state.admitted if state.admitted else 0.0,
+                    "max_wait_seconds": state.max_wait_seconds,
+                }
+            return report
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            with self._lock:
+                state = self._models.get(model)
+                if state is None:
+                    limits = self.model_limits.get(model, {})
+                    state = self._models[model] = _ModelState(
+                        limits.get("requests_per_minute", self.default_rpm),
+                        limits.get("tokens_per_minute", self.default_tpm),
+                    )
+        return state
+
+    @staticmethod
+    def _admit(state: _ModelState, tokens: int, started: float):
+        """Take capacity for a call (caller holds the lock)"""
+        state.requests.consume(1)
+        state.tokens.consume(tokens)
+        state.admitted += 1
+        waited = time.monotonic() - started
+        state.wait_seconds += waited
+        state.max_wait_seconds = max(state.max_wait_seconds, waited)
+
+
+# Process-wide scheduler shared by every adapter
+llm_scheduler = LLMScheduler()
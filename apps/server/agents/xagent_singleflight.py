@@ -0,0 +1,236 @@
+"""
+Single-flight coalescing of identical in-flight LLM round trips
+
+When concurrent LLM calls have the same fingerprint (LLM backend, account,
+completion settings, function schemas and the full chat messages), only
+the first one calls the LLM; the others wait for and share its response.
+Only the round trip is shared: each adapter request still runs its own
+tools and keeps its own state. Streams are fanned out: the first request
+reads the LLM stream at its own pace, as if it were alone, and later
+identical requests replay the chunks it has read.
+If it stops early while others still listen, a background task finishes
+reading the stream for them. Requests may come from different
+event loops (the sync run() bridge uses a background loop), so results are
+handed over through thread-safe futures and notifications.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# Set to 0 to give every request its own LLM call
+XAGENT_COALESCE_REQUESTS = os.environ.get("XAGENT_COALESCE_REQUESTS", "1") == "1"
+
+
+class _FlightAborted(Exception):
+    """The leading request was cancelled before it produced a result"""
+
+
+class _StreamFlight:
+    """Buffered chunks of one shared stream and its subscribers"""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers: Dict[int, tuple] = {}
+        self.producer: Optional[asyncio.Task] = None
+        self.producer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def notify(self):
+        for loop, event in list(self.subscribers.values()):
+            loop.call_soon_threadsafe(event.set)
+
+
+class RequestCoalescer:
+    """
+    Shares one in-flight call among concurrent identical requests
+    """
+
+    def __init__(self, enabled: bool = XAGENT_COALESCE_REQUESTS):
+        self.enabled = enabled
+        self.coalesced = 0
+        self._calls: Dict[str, concurrent.futures.Future] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self._lock = threading.Lock()
+
+    async def run(self, key: str, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await make_call(), or the identical call already in flight
+
+        Args:
+            key: Request fingerprint
+            make_call: Creates the call when this request leads
+
+        Returns:
+            The (shared) result
+        """
+        if not self.enabled:
+            return await make_call()
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = concurrent.futures.Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            try:
+                # Shielded so a cancelled follower does not cancel the shared call
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _FlightAborted:
+                return await self.run(key, make_call)
+
+        try:
+            result = await make_call()
+        except asyncio.CancelledError:
+            future.set_exception(_FlightAborted())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def stream(self, key: str, make_stream: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Iterate make_stream(), or subscribe to the identical stream in flight
+
+        Args:
+            key: Request fingerprint
+            make_stream: Creates the async iterator when this request leads
+
+        Yields:
+            Every chunk of the shared stream, from the first
+        """
+        if not self.enabled:
+            async for chunk in make_stream():
+                yield chunk
+            return
+
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _StreamFlight()
+                flight.producer_loop = asyncio.get_running_loop()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            async for chunk in self._follow(key, flight, make_stream):
+                yield chunk
+            return
+
+        # The leader reads the stream itself, at its own pace; chunks are
+        # kept only so followers can replay what it has already consumed
+        iterator = make_stream().__aiter__()
+        reading = False
+        try:
+            while True:
+                reading = True
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    self._finish(key, flight, None)
+                    return
+                except Exception as e:
+                    self._finish(key, flight, e)
+                    raise
+                reading = False
+                with self._lock:
+                    flight.chunks.append(chunk)
+                    flight.notify()
+                yield chunk
+        finally:
+            if not flight.done:
+                with self._lock:
+                    # Followers still listening take over the stream, unless
+                    # the leader was cancelled in the middle of a read
+                    hand_off = bool(flight.subscribers) and not reading
+                    if hand_off:
+                        flight.producer = flight.producer_loop.create_task(
+                            self._produce(key, flight, iterator)
+                        )
+                if not hand_off:
+                    self._finish(key, flight, _FlightAborted("Shared stream was cancelled"))
+                    if not reading:
+                        await iterator.aclose()
+
+    async def _follow(self, key: str, flight: _StreamFlight,
+                      make_stream: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Replay a shared stream's chunks as they arrive"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        token = id(event)
+        with self._lock:
+            flight.subscribers[token] = (loop, event)
+
+        position = 0
+        try:
+            while True:
+                event.clear()
+                with self._lock:
+                    chunks = flight.chunks[position:]
+                    done, error = flight.done, flight.error
+                for chunk in chunks:
+                    yield chunk
+                position += len(chunks)
+                if chunks:
+                    continue
+                if done:
+                    if error is None:
+                        return
+                    if isinstance(error, _FlightAborted) and not position:
+                        break
+                    raise error
+                await event.wait()
+        finally:
+            with self._lock:
+                flight.subscribers.pop(token, None)
+                abandoned = not flight.subscribers and not flight.done and flight.producer is not None
+                if abandoned and self._streams.get(key) is flight:
+                    del self._streams[key]
+            if abandoned:
+                # Nobody is listening any more; stop reading the LLM stream
+                flight.producer_loop.call_soon_threadsafe(flight.producer.cancel)
+
+        # The leader gave up before producing anything; lead a new attempt
+        async for chunk in self.stream(key, make_stream):
+            yield chunk
+
+    async def _produce(self, key: str, flight: _StreamFlight, iterator: AsyncIterator[Any]):
+        """Keep reading a stream its leader abandoned, for the remaining followers"""
+        error: Optional[BaseException] = None
+        try:
+            async for chunk in iterator:
+                with self._lock:
+                    flight.chunks.append(chunk)
+                    flight.notify()
+        except asyncio.CancelledError:
+            error = _FlightAborted("Shared stream was cancelled")
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            self._finish(key, flight, error)
+
+    def _finish(self, key: str, flight: _StreamFlight, error: Optional[BaseException]):
+        with self._lock:
+            flight.done = True
+            flight.error = error
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            flight.notify()
+
+
+# Process-wide coalescer shared by every adapter
+request_coalescer = RequestCoalescer()
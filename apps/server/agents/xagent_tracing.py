@@ -0,0 +1,213 @@
+"""
+Lightweight tracing for the XAgent conversational pipeline
+
+Stages are wrapped in spans with tracer.span(name, **attributes). Span
+records follow the OpenTelemetry data model (trace/span ids, parent ids,
+nanosecond timestamps, attributes, status), so they can be loaded into any
+OTel-aware tool. The exporter is chosen with XAGENT_TRACING_EXPORTER:
+
+    none  - default; spans are not recorded at all
+    file  - spans are appended as JSON lines to XAGENT_TRACING_FILE
+    otel  - spans go to the configured OpenTelemetry SDK tracer provider
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+XAGENT_TRACING_EXPORTER = os.environ.get("XAGENT_TRACING_EXPORTER", "none")
+XAGENT_TRACING_FILE = os.environ.get("XAGENT_TRACING_FILE", "xagent_traces.jsonl")
+
+
+class Span:
+    """
+    A single timed stage
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "OK"
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        self.status = "ERROR"
+        self.attributes["exception.type"] = type(error).__name__
+        self.attributes["exception.message"] = str(error)
+
+    def end(self):
+        if self.end_time_unix_nano is None:
+            self.end_time_unix_nano = time.time_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": ((self.end_time_unix_nano or self.start_time_unix_nano)
+                            - self.start_time_unix_nano) / 1e6,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class _NoOpSpan:
+    """Span stand-in used when tracing is disabled"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+class _OTelSpan:
+    """Adapts an OpenTelemetry span to the Span interface"""
+
+    def __init__(self, span):
+        self._span = span
+
+    def set_attribute(self, key: str, value: Any):
+        self._span.set_attribute(key, value if isinstance(value, (str, bool, int, float)) else str(value))
+
+    def record_exception(self, error: BaseException):
+        from opentelemetry.trace import Status, StatusCode
+
+        self._span.record_exception(error)
+        self._span.set_status(Status(StatusCode.ERROR, str(error)))
+
+    def end(self):
+        self._span.end()
+
+
+class NoOpSpanExporter:
+    """Discards spans"""
+
+    def export(self, span: Span):
+        pass
+
+
+class FileSpanExporter:
+    """Appends finished spans to a JSON lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_NOOP_SPAN = _NoOpSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("xagent_current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates nested spans and hands finished ones to an exporter
+    """
+
+    def __init__(self, exporter=None):
+        """
+        Args:
+            exporter: Object with export(span); None disables tracing
+        """
+        self.exporter = exporter
+        self._otel_tracer = None
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Build the tracer selected by XAGENT_TRACING_EXPORTER"""
+        if XAGENT_TRACING_EXPORTER == "file":
+            return cls(FileSpanExporter(XAGENT_TRACING_FILE))
+        if XAGENT_TRACING_EXPORTER == "otel":
+            tracer = cls(NoOpSpanExporter())
+            try:
+                from opentelemetry import trace
+                tracer._otel_tracer = trace.get_tracer("l3agi.xagent")
+            except ImportError:
+                tracer.exporter = None
+            return tracer
+        return cls(None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time a stage as a child of the current span
+
+        Exceptions are recorded on the span and re-raised.
+        """
+        if self.exporter is None:
+            yield _NOOP_SPAN
+            return
+
+        if self._otel_tracer is not None:
+            with self._otel_tracer.start_as_current_span(
+                name, record_exception=False, set_status_on_exception=False
+            ) as otel_span:
+                span = _OTelSpan(otel_span)
+                for key, value in attributes.items():
+                    span.set_attribute(key, value)
+                try:
+                    yield span
+                except GeneratorExit:
+                    raise
+                except BaseException as e:
+                    span.record_exception(e)
+                    raise
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            parent_span_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            # The consumer stopped iterating early; not an error
+            raise
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Async generators can be resumed from another context
+                _current_span.set(parent)
+            span.end()
+            self.exporter.export(span)
+
+
+# Process-wide tracer configured from the environment
+tracer = Tracer.from_env()
@@ -0,0 +1,120 @@
+"""
+Non-blocking text-to-speech for streamed responses
+
+Speech synthesis is a blocking network call, so it runs on the default
+executor instead of the event loop. With XAGENT_TTS_SENTENCE_STREAMING
+enabled, StreamingTextToSpeech splits the response into sentence segments
+while it streams and synthesizes them in parallel with generation; the
+voice URL is then the segment URLs, in order, one per line. Otherwise the
+whole response is synthesized once it is complete.
+"""
+
+import asyncio
+import functools
+import os
+import re
+from typing import Callable, List, Optional
+
+# Synthesize sentence segments while the response streams (multi-URL voice_url)
+XAGENT_TTS_SENTENCE_STREAMING = os.environ.get("XAGENT_TTS_SENTENCE_STREAMING", "0") == "1"
+
+# Segments synthesized at once and the minimum length of segments after the first
+XAGENT_TTS_MAX_PARALLEL = int(os.environ.get("XAGENT_TTS_MAX_PARALLEL", "4"))
+XAGENT_TTS_SEGMENT_CHARS = int(os.environ.get("XAGENT_TTS_SEGMENT_CHARS", "200"))
+
+_SENTENCE_END = re.compile(r"[.!?\n]+[\"')\]]*\s+")
+
+
+class StreamingTextToSpeech:
+    """
+    Turns a streamed response into speech without blocking the event loop
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[[str], str],
+        sentence_streaming: bool = XAGENT_TTS_SENTENCE_STREAMING,
+        max_parallel: int = XAGENT_TTS_MAX_PARALLEL,
+        segment_chars: int = XAGENT_TTS_SEGMENT_CHARS,
+    ):
+        """
+        Initialize the TTS stage
+
+        Args:
+            synthesize: Blocking callable text -> voice URL, e.g.
+                lambda text: text_to_speech(text, configs, voice_settings)
+            sentence_streaming: Synthesize sentence segments during streaming
+            max_parallel: Segments synthesized concurrently
+            segment_chars: Minimum characters per segment after the first,
+                which is a single sentence so audio starts early
+        """
+        self.synthesize = synthesize
+        self.sentence_streaming = sentence_streaming
+        self.segment_chars = segment_chars
+        self._semaphore = asyncio.Semaphore(max(1, max_parallel))
+        self._buffer = ""
+        self._fed: List[str] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def feed(self, chunk: str):
+        """Add a streamed chunk, starting synthesis of any finished segments"""
+        if not self.sentence_streaming or not chunk:
+            return
+
+        self._fed.append(chunk)
+        self._buffer += chunk
+        while True:
+            boundary = self._segment_boundary()
+            if boundary is None:
+                return
+            segment, self._buffer = self._buffer[:boundary], self._buffer[boundary:]
+            self._start(segment)
+
+    async def finish(self, text: str) -> Optional[str]:
+        """
+        Synthesize whatever remains and return the voice URL
+
+        Args:
+            text: The final response; if it differs from the streamed chunks
+                (e.g. after a fallback) it is synthesized from scratch
+
+        Returns:
+            The voice URL, or one URL per line for sentence segments
+        """
+        if not self.sentence_streaming or "".join(self._fed) != text:
+            self.cancel()
+            return await self._synthesize(text) if text.strip() else None
+
+        if self._buffer.strip():
+            self._start(self._buffer)
+        self._buffer = ""
+
+        try:
+            urls = await asyncio.gather(*self._tasks)
+        finally:
+            self.cancel()
+        return "\n".join(url for url in urls if url) or None
+
+    def cancel(self):
+        """Drop segments not yet synthesized"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._buffer = ""
+
+    def _segment_boundary(self) -> Optional[int]:
+        minimum = self.segment_chars if self._tasks else 1
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if match.end() >= minimum:
+                return match.end()
+        return None
+
+    def _start(self, segment: str):
+        if segment.strip():
+            self._tasks.append(asyncio.ensure_future(self._synthesize(segment)))
+
+    async def _synthesize(self, text: str) -> str:
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.synthesize, text.strip())
+            )
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the L3AGI XAgent adapter
+
+Runs entirely offline against MockLLMBackend, so the numbers measure adapter
+overhead (the arun loop, streaming, the sync bridge and concurrent tool
+execution) rather than provider latency. XAgent initialization is skipped
+when an llm_backend is set, so it is not measured here. Results are written as a JSON report
+that can be tracked per release.
+
+Usage:
+    python benchmark_xagent.py --sessions 1 10 100 1000 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Add current directory to path for local imports
+current_path = os.path.dirname(__file__)
+if current_path not in sys.path:
+    sys.path.insert(0, current_path)
+
+from agents.xagent_batching import MicroBatcher
+from agents.xagent_integration import L3AGIXAgentAdapter, tool_executor
+from agents.xagent_mock_llm import MockLLMBackend
+
+
+class EchoTool:
+    """Minimal synchronous tool used to measure dispatch overhead"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.description = f"Echoes its input ({name})"
+
+    def run(self, text: str = "") -> str:
+        return text
+
+
+class AsyncEchoTool(EchoTool):
+    """Minimal async tool, run on the event loop instead of the thread pool"""
+
+    async def run(self, text: str = "") -> str:
+        return text
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def create_adapter(backend, tools=None):
+    return L3AGIXAgentAdapter(
+        config={"model_name": "mock-llm", "temperature": 0.0},
+        tools=tools or [],
+        system_message="You are a benchmark assistant.",
+        llm_backend=backend,
+    )
+
+
+async def bench_arun(backend, sessions):
+    """arun latency with N concurrent sessions"""
+    adapters = [create_adapter(backend) for _ in range(sessions)]
+
+    async def one(index, adapter):
+        started = time.perf_counter()
+        await adapter.arun(f"request {index}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*[one(i, a) for i, a in enumerate(adapters)])
+    elapsed = time.perf_counter() - started
+
+    return dict(summarize(samples), wall_ms=elapsed * 1000, throughput_rps=sessions / elapsed)
+
+
+async def bench_micro_batch(latency, sessions):
+    """arun throughput with N concurrent sessions, one call each versus micro-batched"""
+    results = {}
+    for mode in ("unbatched", "batched"):
+        backend = MockLLMBackend(latency=latency)
+        results[mode] = await bench_arun(MicroBatcher(backend) if mode == "batched" else backend, sessions)
+        results[mode]["backend_calls"] = backend.batch_calls if mode == "batched" else backend.calls
+    return results
+
+
+async def bench_astream(backend, sessions):
+    """astream time-to-first-chunk and total time with N concurrent sessions"""
+    adapters = [create_adapter(backend) for _ in range(sessions)]
+
+    async def one(index, adapter):
+        started = time.perf_counter()
+        first_chunk = None
+        async for _ in adapter.astream(f"stream request number {index} with a few words"):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+        return first_chunk, time.perf_counter() - started
+
+    results = await asyncio.gather(*[one(i, a) for i, a in enumerate(adapters)])
+    return {
+        "time_to_first_chunk": summarize([first for first, _ in results]),
+        "total": summarize([total for _, total in results]),
+    }
+
+
+def bench_run_sync(backend, iterations):
+    """Overhead of the sync run() bridge compared to awaiting arun directly"""
+    adapter = create_adapter(backend)
+
+    sync_samples = []
+    for index in range(iterations):
+        started = time.perf_counter()
+        adapter.run(f"sync request {index}")
+        sync_samples.append(time.perf_counter() - started)
+
+    async def direct():
+        samples = []
+        for index in range(iterations):
+            started = time.perf_counter()
+            await adapter.arun(f"async request {index}")
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    async_samples = asyncio.run(direct())
+    sync_summary = summarize(sync_samples)
+    async_summary = summarize(async_samples)
+    return {
+        "run": sync_summary,
+        "arun": async_summary,
+        "bridge_overhead_p50_ms": sync_summary["p50_ms"] - async_summary["p50_ms"],
+    }
+
+
+async def bench_tool_dispatch(sessions, tool_count=10):
+    """tool_executor.execute latency with N concurrent sessions, for sync and async tools"""
+    results = {}
+    for kind, tool_class in (("sync", EchoTool), ("async", AsyncEchoTool)):
+        tools = [tool_class(f"tool_{index}") for index in range(tool_count)]
+        adapters = [create_adapter(MockLLMBackend(), tools=tools) for _ in range(sessions)]
+
+        async def one(index, adapter):
+            function_call = {"name": f"tool_{index % tool_count}", "arguments": '{"text": "ping"}'}
+            started = time.perf_counter()
+            await tool_executor.execute(adapter, [function_call])
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*[one(i, a) for i, a in enumerate(adapters)])
+        elapsed = time.perf_counter() - started
+        results[kind] = dict(summarize(samples), wall_ms=elapsed * 1000, throughput_rps=sessions / elapsed)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the L3AGI XAgent adapter offline")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="Concurrent session counts to measure")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Mock LLM latency before the first token, in seconds")
+    parser.add_argument("--chunk-latency", type=float, default=0.005,
+                        help="Mock LLM latency between streamed chunks, in seconds")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="Iterations for the serial benchmarks")
+    parser.add_argument("--output", default=None,
+                        help="Write the JSON report to this file (stdout otherwise)")
+    args = parser.parse_args()
+
+    backend = MockLLMBackend(latency=args.latency, chunk_latency=args.chunk_latency)
+    no_latency_backend = MockLLMBackend()
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": {
+            "arun": {
+                str(sessions): asyncio.run(bench_arun(backend, sessions))
+                for sessions in args.sessions
+            },
+            "micro_batch": {
+                str(sessions): asyncio.run(bench_micro_batch(args.latency, sessions))
+                for sessions in args.sessions
+            },
+            "astream": {
+                str(sessions): asyncio.run(bench_astream(backend, sessions))
+                for sessions in args.sessions
+            },
+            "run_sync": bench_run_sync(no_latency_backend, args.iterations),
+            "tool_dispatch": {
+                str(sessions): asyncio.run(bench_tool_dispatch(sessions))
+                for sessions in args.sessions
+            },
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Benchmark report written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,22 @@
+import asyncio
+import json
 import os
 import sys
-from langchain.smith import RunEvalConfig, run_on_dataset
-from langchain_community.chat_models import ChatOpenAI
-from langsmith import Client
 
 # Add XAgent to Python path
 xagent_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'XAgent')
 if xagent_path not in sys.path:
     sys.path.insert(0, xagent_path)
 
+from agents.xagent_cache import XAgentResponseCache
+from agents.xagent_eval import XAGENT_EVAL_CONCURRENCY, XAgentEvalRunner, load_dataset
 from agents.xagent_integration import L3AGIXAgentAdapter
 
+# Deterministic (temperature 0) eval prompts are answered from this cache on re-runs
+response_cache = XAgentResponseCache(
+    path=os.path.join(os.path.dirname(__file__), ".xagent_response_cache.sqlite")
+)
+
 # TODO: refactor test to use new auth
 
 # res = requests.post(
@@ -27,21 +33,25 @@ from agents.xagent_integration import L3AGIXAgentAdapter
 # }
 
 
+AGENT_KWARGS = {
+    "config": {
+        "model_name": "gpt-3.5-turbo",
+        "temperature": 0.0
+    },
+    "tools": [],  # Add tools as needed for testing
+    "system_message": "You are a helpful assistant that can answer questions and perform tasks.",
+    "memory": None,
+    "response_cache": response_cache,
+}
+
+
 def agent_factory():
     """
     Factory function to create XAgent-based agent for testing
     """
     try:
         # Create XAgent adapter for testing
-        xagent_adapter = L3AGIXAgentAdapter(
-            config={
-                "model_name": "gpt-3.5-turbo",
-                "temperature": 0.0
-            },
-            tools=[],  # Add tools as needed for testing
-            system_message="You are a helpful assistant that can answer questions and perform tasks.",
-            memory=None
-        )
+        xagent_adapter = L3AGIXAgentAdapter(**AGENT_KWARGS)
         
         return xagent_adapter
     except Exception as e:
@@ -51,24 +61,39 @@ def agent_factory():
 
 agent = agent_factory()
 
-client = Client()
+# Set XAGENT_EVAL_DATASET to a local JSON/JSONL file ({"input": ..., "output": ...}
+# per example) to evaluate it concurrently with the in-repo runner
+local_dataset = os.environ.get("XAGENT_EVAL_DATASET")
 
+if local_dataset:
+    runner = XAgentEvalRunner(
+        adapter_kwargs=AGENT_KWARGS,
+        checkpoint_path=f"{local_dataset}.checkpoint.jsonl",
+    )
+    report = asyncio.run(runner.run(load_dataset(local_dataset)))
+    print(json.dumps(report["summary"], indent=2))
+else:
+    from langchain.smith import RunEvalConfig, run_on_dataset
+    from langchain_community.chat_models import ChatOpenAI
+    from langsmith import Client
 
-eval_config = RunEvalConfig(
-    evaluators=[
-        "qa",
-        RunEvalConfig.Criteria("helpfulness"),
-        RunEvalConfig.Criteria("conciseness"),
-    ],
-    input_key="input",
-    eval_llm=ChatOpenAI(temperature=0.5, model_name="gpt-3.5-turbo"),
-)
+    client = Client()
 
-chain_results = run_on_dataset(
-    client,
-    dataset_name="test-dataset",
-    llm_or_chain_factory=agent_factory,
-    evaluation=eval_config,
-    concurrency_level=1,
-    verbose=True,
-)
+    eval_config = RunEvalConfig(
+        evaluators=[
+            "qa",
+            RunEvalConfig.Criteria("helpfulness"),
+            RunEvalConfig.Criteria("conciseness"),
+        ],
+        input_key="input",
+        eval_llm=ChatOpenAI(temperature=0.5, model_name="gpt-3.5-turbo"),
+    )
+
+    chain_results = run_on_dataset(
+        client,
+        dataset_name="test-dataset",
+        llm_or_chain_factory=agent_factory,
+        evaluation=eval_config,
+        concurrency_level=XAGENT_EVAL_CONCURRENCY,
+        verbose=True,
+    )
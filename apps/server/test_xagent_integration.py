@@ -24,6 +24,18 @@ except ImportError as e:
     print(f"❌ Failed to import L3AGIXAgentAdapter: {e}")
     sys.exit(1)
 
+# Run against the local mock LLM instead of a live endpoint
+OFFLINE = "--offline" in sys.argv or os.environ.get("XAGENT_OFFLINE") == "1"
+
+
+def create_llm_backend():
+    """Mock LLM backend in offline mode, None (XAgent + OpenAI) otherwise"""
+    if not OFFLINE:
+        return None
+    
+    from agents.xagent_mock_llm import MockLLMBackend
+    return MockLLMBackend(latency=0.01, chunk_latency=0.001)
+
 
 async def test_xagent_basic():
     """Test basic XAgent functionality"""
@@ -38,7 +50,8 @@ async def test_xagent_basic():
             },
             tools=[],
             system_message="You are a helpful assistant. Always respond with 'Hello from XAgent!'",
-            memory=None
+            memory=None,
+            llm_backend=create_llm_backend()
         )
         
         print("✅ XAgent adapter created successfully")
@@ -75,7 +88,8 @@ def test_xagent_sync():
             },
             tools=[],
             system_message="You are a helpful assistant. Always respond with 'Hello from XAgent sync!'",
-            memory=None
+            memory=None,
+            llm_backend=create_llm_backend()
         )
         
         print("✅ XAgent adapter created successfully")
@@ -112,7 +126,8 @@ async def test_xagent_streaming():
             },
             tools=[],
             system_message="You are a helpful assistant.",
-            memory=None
+            memory=None,
+            llm_backend=create_llm_backend()
         )
         
         print("✅ XAgent adapter created successfully")
@@ -142,9 +157,246 @@ async def test_xagent_streaming():
         return False
 
 
+def _offline_adapter(backend, **kwargs):
+    """Adapter on a mock backend for the offline concurrency tests"""
+    kwargs.setdefault("config", {"model_name": "mock-llm", "temperature": 0.7})
+    return L3AGIXAgentAdapter(
+        system_message="You are a helpful assistant.",
+        llm_backend=backend,
+        **kwargs
+    )
+
+
+def _check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    return bool(condition)
+
+
+async def test_adapter_pool_reuse():
+    """Warm adapters are reused and take the new caller's settings"""
+    print("\n🧪 Testing adapter pool reuse...")
+    from agents.xagent_integration import XAgentAdapterPool
+    from agents.xagent_mock_llm import MockLLMBackend
+    
+    backend = MockLLMBackend()
+    pool = XAgentAdapterPool(max_size=4)
+    with pool.lease("agent", llm_backend=backend, account_id="first", timeout=5) as adapter:
+        await adapter.arun("warm up")
+    with pool.lease("agent", llm_backend=backend, account_id="second") as reused:
+        pass
+    with pool.lease("agent", llm_backend=MockLLMBackend()) as other_backend:
+        pass
+    
+    return all([
+        _check("Adapter reused", reused is adapter),
+        _check("Caller settings applied", reused.account_id == "second" and reused.timeout != 5),
+        _check("Other backend gets its own adapter", other_backend is not adapter),
+    ])
+
+
+async def test_scheduler_priority():
+    """Queued LLM calls are admitted interactive first"""
+    print("\n🧪 Testing LLM scheduler priority...")
+    from agents.xagent_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, LLMScheduler
+    
+    scheduler = LLMScheduler(model_limits={}, backoff=0.05)
+    # A rate-limit error pauses the model, so the next calls queue up
+    scheduler.report_rate_limited("mock-llm")
+    admitted = []
+    
+    async def call(name, priority):
+        await scheduler.acquire("mock-llm", 10, priority)
+        admitted.append(name)
+    
+    batch = asyncio.ensure_future(call("batch", PRIORITY_BATCH))
+    await asyncio.sleep(0)
+    interactive = asyncio.ensure_future(call("interactive", PRIORITY_INTERACTIVE))
+    await asyncio.gather(batch, interactive)
+    
+    metrics = scheduler.metrics()["mock-llm"]
+    return all([
+        _check("Interactive admitted first", admitted == ["interactive", "batch"], admitted),
+        _check("Rate limit counted", metrics["rate_limited"] == 1),
+    ])
+
+
+async def test_request_coalescing():
+    """Identical in-flight requests share LLM calls and streams, not tools"""
+    print("\n🧪 Testing request coalescing...")
+    import json
+    from agents.xagent_mock_llm import MockLLMBackend
+    
+    backend = MockLLMBackend(latency=0.05, chunk_latency=0.005)
+    results = await asyncio.gather(*[_offline_adapter(backend).arun("same") for _ in range(5)])
+    arun_calls = backend.calls
+    shared_call = arun_calls == 1 and len(set(results)) == 1
+    
+    async def consume(limit=None):
+        chunks = []
+        async for chunk in _offline_adapter(backend).astream("one two three four five"):
+            chunks.append(chunk)
+            if limit and len(chunks) >= limit:
+                break
+        return "".join(chunks)
+    
+    backend.calls = 0
+    full, partial, follower = await asyncio.gather(consume(), consume(limit=1), consume())
+    shared_stream = backend.calls == 1 and full == follower and partial and full.startswith(partial)
+    
+    # A cancelled leader does not take its followers down
+    backend.calls = 0
+    leader = asyncio.ensure_future(_offline_adapter(backend).arun("cancelled"))
+    await asyncio.sleep(0.01)
+    follower = asyncio.ensure_future(_offline_adapter(backend).arun("cancelled"))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    follower_result = await follower
+    
+    # Side-effecting tools run for every request
+    sent = []
+    
+    class EmailTool:
+        name = "email"
+        description = "Sends an email"
+        
+        async def run(self, to=""):
+            sent.append(to)
+            return f"sent to {to}"
+    
+    def responder(messages, functions):
+        if messages[-1]["role"] == "function" or messages[-1]["content"].startswith("Result of tool"):
+            return "Done"
+        return {"function_call": {"name": "email", "arguments": json.dumps({"to": "bob"})}}
+    
+    tool_backend = MockLLMBackend(responder=responder, latency=0.05)
+    await asyncio.gather(*[
+        _offline_adapter(tool_backend, tools=[EmailTool()]).arun("email bob") for _ in range(2)
+    ])
+    
+    return all([
+        _check("Concurrent arun calls share one LLM call", shared_call, f"{arun_calls} call(s)"),
+        _check("Streams fan out from one LLM stream", shared_stream),
+        _check("Follower survives a cancelled leader", follower_result == "Echo: cancelled", follower_result),
+        _check("Tools run for every request", sent == ["bob", "bob"] and tool_backend.calls == 2,
+               f"{len(sent)} email(s), {tool_backend.calls} LLM call(s)"),
+    ])
+
+
+async def test_micro_batching():
+    """Batched requests get back their own responses"""
+    print("\n🧪 Testing micro-batching...")
+    from agents.xagent_batching import MicroBatcher
+    from agents.xagent_mock_llm import MockLLMBackend
+    
+    backend = MockLLMBackend(latency=0.02)
+    batcher = MicroBatcher(backend, window=0.01, max_batch_size=8)
+    prompts = [f"request {index}" for index in range(20)]
+    results = await asyncio.gather(*[_offline_adapter(batcher).arun(prompt) for prompt in prompts])
+    
+    return all([
+        _check("Responses demultiplexed", results == [f"Echo: {prompt}" for prompt in prompts]),
+        _check("Requests batched", backend.batch_calls == 3 and backend.calls == 20,
+               f"{backend.batch_calls} batch calls"),
+    ])
+
+
+async def test_early_tool_start():
+    """A streamed function call's tool starts before the stream ends"""
+    print("\n🧪 Testing early tool start...")
+    import json
+    from agents.xagent_mock_llm import MockLLMBackend
+    
+    tool_started = asyncio.Event()
+    calls = []
+    
+    class LookupTool:
+        name = "lookup"
+        description = "Looks up a value"
+        
+        async def run(self, query=""):
+            calls.append(query)
+            tool_started.set()
+            return f"value of {query}"
+    
+    class TailBackend(MockLLMBackend):
+        """Holds the end of the stream until the tool has started"""
+        started_before_end = None
+        
+        async def astream(self, request, functions):
+            async for delta in super().astream(request, functions):
+                if delta.get("usage") and self.started_before_end is None:
+                    try:
+                        await asyncio.wait_for(tool_started.wait(), timeout=1)
+                        self.started_before_end = True
+                    except asyncio.TimeoutError:
+                        self.started_before_end = False
+                yield delta
+    
+    def responder(messages, functions):
+        if messages[-1]["role"] == "function":
+            return f"Answer: {messages[-1]['content']}"
+        return {"function_call": {"name": "lookup", "arguments": json.dumps({"query": "x"})}}
+    
+    backend = TailBackend(responder=responder)
+    chunks = [chunk async for chunk in _offline_adapter(backend, tools=[LookupTool()]).astream("look up x")]
+    
+    return all([
+        _check("Tool started before the stream ended", backend.started_before_end),
+        _check("Tool ran once", calls == ["x"], calls),
+        _check("Answer streamed", "".join(chunks) == "Answer: value of x", "".join(chunks)),
+    ])
+
+
+def test_history_cache():
+    """History is served from the cache only while it matches the backend"""
+    print("\n🧪 Testing chat history cache...")
+    from types import SimpleNamespace
+    from agents.xagent_memory import load_history, memory_writer
+    
+    stored = []
+    
+    class FakeMemory:
+        """Zep-like memory with a latest-message query"""
+        memory_key = "chat_history"
+        auto_save = True
+        
+        def __init__(self):
+            client = SimpleNamespace(memory=SimpleNamespace(
+                get_memory=lambda session_id, lastn=None: SimpleNamespace(messages=stored[-lastn:])
+            ))
+            self.chat_memory = SimpleNamespace(session_id="offline-history", zep_client=client)
+            self.loads = 0
+        
+        def load_memory_variables(self, inputs):
+            self.loads += 1
+            return {"chat_history": list(stored)}
+        
+        def save_context(self, inputs, outputs):
+            stored.append(SimpleNamespace(type="human", content=inputs["input"]))
+            stored.append(SimpleNamespace(type="ai", content=outputs["output"]))
+    
+    memory = FakeMemory()
+    load_history(memory)
+    memory_writer.save(memory, "hello", "hi")
+    memory_writer.flush(5)
+    own_write = [message["content"] for message in load_history(memory)]
+    own_write_loads = memory.loads
+    
+    # Another server worker writes to the same session
+    stored.append(SimpleNamespace(type="human", content="from elsewhere"))
+    other_write = [message["content"] for message in load_history(memory)]
+    
+    return all([
+        _check("Own writes served from the cache", own_write == ["hello", "hi"] and own_write_loads == 1),
+        _check("Other workers' writes reloaded", other_write[-1] == "from elsewhere" and memory.loads == 2),
+    ])
+
+
 def main():
     """Main test function"""
     print("🚀 Starting XAgent Integration Tests for L3AGI Framework")
+    if OFFLINE:
+        print("🔌 Offline mode: using the local mock LLM backend")
     print("=" * 60)
     
     # Test results
@@ -174,6 +426,23 @@ def main():
         print(f"❌ Streaming test failed to run: {e}")
         results.append(("Streaming", False))
     
+    # Offline-only checks of the concurrency components
+    if OFFLINE:
+        offline_tests = [
+            ("Adapter Pool", lambda: asyncio.run(test_adapter_pool_reuse())),
+            ("Scheduler Priority", lambda: asyncio.run(test_scheduler_priority())),
+            ("Coalescing", lambda: asyncio.run(test_request_coalescing())),
+            ("Micro-batching", lambda: asyncio.run(test_micro_batching())),
+            ("Early Tool Start", lambda: asyncio.run(test_early_tool_start())),
+            ("History Cache", test_history_cache),
+        ]
+        for name, test in offline_tests:
+            try:
+                results.append((name, test()))
+            except Exception as e:
+                print(f"❌ {name} test failed to run: {e}")
+                results.append((name, False))
+    
     # Print results summary
     print("\n" + "=" * 60)
     print("📊 TEST RESULTS SUMMARY")